@@ -0,0 +1,427 @@
+"""OpenAI-backed assistants: feature quality assessment and story breakdown.
+
+Imported lazily by the routes; the HTTP client is only loaded by the live
+LLM backend.
+"""
+import json
+import math
+import re
+import time
+from datetime import datetime
+
+from flask import current_app
+
+import metrics
+import profiling
+from llm_backends import get_backend
+
+# ==================================================
+# AI FEATURE QUALITY (IN-MEMORY CACHE)
+# ==================================================
+AI_QUALITY_CACHE = {}  # { feature_id: {"result": {...}, "ts": "..."} }
+
+AI_QUALITY_SYSTEM_PROMPT = (
+    "You are an expert SAFe Program Consultant, Senior Agile Coach, and Enterprise Product Strategist.\n\n"
+    "You specialize in:\n"
+    "- WSJF prioritization\n"
+    "- SAFe Feature definition standards\n"
+    "- INVEST and SMART criteria\n"
+    "- Acceptance criteria quality\n"
+    "- Outcome-driven product management\n"
+    "- Risk and dependency analysis\n"
+    "- Enterprise architecture alignment\n\n"
+    "Your job is to critically assess the quality of a Feature used in PI Planning.\n\n"
+    "Be direct, analytical, and practical.\n"
+    "Do NOT give generic advice.\n"
+    "Be specific and actionable.\n"
+    "Score objectively.\n\n"
+    "Return structured output in JSON format only."
+)
+
+
+def _openai_chat(messages, temperature: float = 0.2, max_tokens: int = 1600) -> str:
+    """Calls OpenAI Chat Completions through the configured LLM backend.
+
+    Note: keep implementation dependency-free. Live mode requires OPENAI_API_KEY;
+    see llm_backends for record / replay / fake modes.
+    """
+    payload = {
+        "model": current_app.config.get("OPENAI_MODEL", "gpt-4o-mini"),
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "response_format": {"type": "json_object"},
+    }
+    backend = get_backend()
+    start = time.perf_counter()
+    try:
+        status, data = backend.complete(payload)
+    except Exception:
+        metrics.OPENAI_DURATION.observe(time.perf_counter() - start, status="error")
+        raise
+    label = status if backend.name in ("live", "record") else backend.name
+    metrics.OPENAI_DURATION.observe(time.perf_counter() - start, status=label)
+    if status >= 400:
+        raise RuntimeError(f"OpenAI error {status}: {data}")
+
+    usage = data.get("usage") or {}
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if usage.get(kind):
+            metrics.OPENAI_TOKENS.inc(usage[kind], kind=kind.replace("_tokens", ""))
+
+    return data["choices"][0]["message"]["content"]
+
+
+def _safe_json_loads(text: str):
+    """Robust JSON parsing: prefers full string; falls back to extracting first JSON object."""
+    try:
+        return json.loads(text)
+    except Exception:
+        m = re.search(r"\{[\s\S]*\}", text)
+        if not m:
+            raise
+        return json.loads(m.group(0))
+
+
+def _safe_num(v):
+    try:
+        if v is None or (isinstance(v, float) and math.isnan(v)):
+            return 0.0
+        return float(v)
+    except Exception:
+        return 0.0
+
+
+def _feature_quality_block(row: dict) -> str:
+    """Feature details + current WSJF inputs, as shown to the assessor."""
+    feature_id = str(row.get("Feature ID", "")).strip()
+    feature_name = str(row.get("Feature Name", "")).strip()
+    feature_description = str(row.get("Feature Description", "")).strip()
+    acceptance_criteria = str(row.get("Feature Acceptance Criteria", "")).strip()
+
+    business_value = _safe_num(row.get("Business Value"))
+    time_criticality = _safe_num(row.get("Time Complexity"))
+    oe_rr = _safe_num(row.get("OE/RR Value"))
+    job_size = _safe_num(row.get("Job Size"))
+    story_points = _safe_num(row.get("Story Points"))
+
+    cost_of_delay = business_value + time_criticality + oe_rr
+    wsjf = round(cost_of_delay / job_size, 2) if job_size > 0 else 0
+
+    return f"""Feature ID: {feature_id}
+Feature Name: {feature_name}
+
+Description:
+{feature_description}
+
+Acceptance Criteria:
+{acceptance_criteria}
+
+Current WSJF Inputs:
+- Business Value: {business_value}
+- Time Criticality: {time_criticality}
+- OE / RR Value: {oe_rr}
+- Job Size: {job_size}
+- Story Points: {story_points}
+- Calculated Cost of Delay: {round(cost_of_delay, 2)}
+- Calculated WSJF: {wsjf}
+"""
+
+
+_QUALITY_RUBRIC = """Evaluate this Feature on the following dimensions (score 1–5 where 5 is excellent):
+
+1. Strategic Alignment (Does it clearly link to business outcome or OKR?)
+2. Clarity of Problem Statement
+3. Quality of Acceptance Criteria
+4. Testability & Measurability
+5. Size Appropriateness (Is it feature-sized or too large/small?)
+6. Risk Visibility (Dependencies, compliance, architecture impact)
+7. WSJF Input Justification (Do the numbers logically match the feature?)
+
+For each dimension:
+- Give a score (1–5)
+- Provide 2–3 lines explaining WHY
+- Suggest 1 concrete improvement
+
+Then provide:
+
+- Overall Feature Quality Score (average out of 5)
+- Maturity Level:
+    1. Weak
+    2. Needs Refinement
+    3. PI-Ready with Risks
+    4. Strong
+    5. Exemplary
+
+- Top 3 Improvements Required Before PI Commitment
+- A rewritten improved Feature version (concise, high-quality)
+"""
+
+_QUALITY_SCHEMA = """{
+  "dimension_scores": [
+    {
+      "dimension": "",
+      "score": 0,
+      "reason": "",
+      "improvement": ""
+    }
+  ],
+  "overall_score": 0,
+  "maturity_level": "",
+  "top_3_improvements": [],
+  "improved_feature_version": ""
+}"""
+
+
+def build_ai_feature_quality_user_prompt(row: dict) -> str:
+    return (
+        "You are assessing the following Feature used in PI Planning.\n\n"
+        + _feature_quality_block(row)
+        + "\n---\n\n"
+        + _QUALITY_RUBRIC
+        + "\nReturn response strictly in JSON with this structure:\n\n"
+        + _QUALITY_SCHEMA
+        + "\n"
+    )
+
+
+def _cache_quality_result(row: dict, data: dict) -> dict:
+    feature_id = str(row.get("Feature ID", ""))
+    result = {
+        "feature_id": feature_id,
+        "feature_name": str(row.get("Feature Name", "")),
+        "assessment": {
+            "dimension_scores": data.get("dimension_scores", []),
+            "overall_score": data.get("overall_score", 0),
+            "maturity_level": data.get("maturity_level", ""),
+            "top_3_improvements": data.get("top_3_improvements", []),
+            "improved_feature_version": data.get("improved_feature_version", ""),
+        },
+    }
+
+    AI_QUALITY_CACHE[feature_id] = {"result": result, "ts": datetime.utcnow().isoformat() + "Z"}
+    return result
+
+
+@profiling.profiled("feature_quality")
+def assess_feature_quality(row: dict) -> dict:
+    """Runs the quality assessment for one feature row and caches the result."""
+    user_prompt = build_ai_feature_quality_user_prompt(row)
+
+    content = _openai_chat(
+        messages=[
+            {"role": "system", "content": AI_QUALITY_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ],
+        temperature=0.2,
+        max_tokens=1800,
+    )
+
+    metrics.AI_QUALITY_ASSESSMENTS.inc(mode="single")
+    return _cache_quality_result(row, _safe_json_loads(content))
+
+
+# ==================================================
+# AI FEATURE QUALITY (PACKED: several features per call)
+# ==================================================
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (~4 chars per token for English prose)."""
+    return len(text) // 4 + 1
+
+
+def _valid_assessment(data) -> bool:
+    """Schema check for one assessment; failures are re-run as single calls."""
+    if not isinstance(data, dict):
+        return False
+    dims = data.get("dimension_scores")
+    if not isinstance(dims, list) or not dims:
+        return False
+    for d in dims:
+        if not isinstance(d, dict) or not isinstance(d.get("dimension"), str):
+            return False
+        if not isinstance(d.get("score"), (int, float)) or isinstance(d.get("score"), bool):
+            return False
+    return (
+        isinstance(data.get("overall_score"), (int, float))
+        and not isinstance(data.get("overall_score"), bool)
+        and isinstance(data.get("maturity_level"), str)
+        and isinstance(data.get("top_3_improvements"), list)
+        and isinstance(data.get("improved_feature_version"), str)
+    )
+
+
+def build_packed_quality_prompt(rows) -> str:
+    blocks = "\n".join(
+        f"=== FEATURE {i} ===\n{_feature_quality_block(row)}" for i, row in enumerate(rows, start=1)
+    )
+    ids = ", ".join(f'"{str(r.get("Feature ID", "")).strip()}"' for r in rows)
+    return (
+        f"You are assessing the following {len(rows)} Features used in PI Planning.\n"
+        "Assess each Feature independently; do not compare them with each other.\n\n"
+        + blocks
+        + "\n---\n\n"
+        + _QUALITY_RUBRIC.replace("Evaluate this Feature", "Evaluate each Feature")
+        + "\nReturn response strictly in JSON, keyed by Feature ID "
+        + f"(exactly these keys: {ids}), with this structure:\n\n"
+        + '{\n  "results": {\n    "<Feature ID>": '
+        + _QUALITY_SCHEMA.replace("\n", "\n    ")
+        + "\n  }\n}\n"
+    )
+
+
+def pack_features(rows, input_budget: int, output_per_feature: int, max_output: int, max_features: int):
+    """Greedily groups rows so each packed call fits the token budget."""
+    fixed = estimate_tokens(AI_QUALITY_SYSTEM_PROMPT) + estimate_tokens(build_packed_quality_prompt([]))
+    packs, current, used = [], [], fixed
+    for row in rows:
+        cost = estimate_tokens(_feature_quality_block(row)) + 16  # + per-feature header / key
+        full = (
+            len(current) >= max_features
+            or used + cost > input_budget
+            or (len(current) + 1) * output_per_feature > max_output
+        )
+        if current and full:
+            packs.append(current)
+            current, used = [], fixed
+        current.append(row)
+        used += cost
+    if current:
+        packs.append(current)
+    return packs
+
+
+@profiling.profiled("feature_quality_batch")
+def assess_features_packed(rows) -> dict:
+    """Assesses many features with as few completions as the budget allows.
+
+    Returns ``{"results": {feature_id: result}, "errors": {feature_id: msg},
+    "calls": n}``. Any feature whose packed answer is missing or fails the
+    schema check is re-assessed on its own.
+    """
+    cfg = current_app.config
+    output_per_feature = cfg.get("AI_PACK_OUTPUT_TOKENS_PER_FEATURE", 1200)
+    packs = pack_features(
+        rows,
+        input_budget=cfg.get("AI_PACK_INPUT_TOKENS", 6000),
+        output_per_feature=output_per_feature,
+        max_output=cfg.get("AI_PACK_MAX_OUTPUT_TOKENS", 12000),
+        max_features=cfg.get("AI_PACK_MAX_FEATURES", 8),
+    )
+
+    results, errors, calls = {}, {}, 0
+    for pack in packs:
+        fallback = list(pack)
+        if len(pack) > 1:
+            calls += 1
+            try:
+                content = _openai_chat(
+                    messages=[
+                        {"role": "system", "content": AI_QUALITY_SYSTEM_PROMPT},
+                        {"role": "user", "content": build_packed_quality_prompt(pack)},
+                    ],
+                    temperature=0.2,
+                    max_tokens=output_per_feature * len(pack),
+                )
+                packed = _safe_json_loads(content).get("results") or {}
+            except Exception:
+                packed = {}
+
+            fallback = []
+            for row in pack:
+                fid = str(row.get("Feature ID", "")).strip()
+                data = packed.get(fid) if isinstance(packed, dict) else None
+                if _valid_assessment(data):
+                    metrics.AI_QUALITY_ASSESSMENTS.inc(mode="packed")
+                    results[fid] = _cache_quality_result(row, data)
+                else:
+                    fallback.append(row)
+
+        for row in fallback:
+            fid = str(row.get("Feature ID", "")).strip()
+            calls += 1
+            try:
+                results[fid] = assess_feature_quality(row)
+            except RuntimeError as e:
+                errors[fid] = str(e)
+            except Exception:
+                errors[fid] = "Failed to evaluate feature quality"
+
+    return {"results": results, "errors": errors, "calls": calls}
+
+
+# ==================================================
+# AI: Feature -> User Story breakdown (SIMPLE)
+# ==================================================
+BREAKDOWN_SYSTEM_PROMPT = (
+    "You are an expert Agile Product Owner. "
+    "Break down a SAFe Feature into clear, sprint-implementable user stories. "
+    "Keep it simple and practical. Avoid over-engineering."
+)
+
+
+@profiling.profiled("breakdown_feature")
+def breakdown_feature(feature: dict) -> dict:
+    """Asks the model for a story breakdown; returns the normalized payload."""
+    user = f"""
+Break down this Feature into user stories.
+
+Feature ID: {feature['Feature ID']}
+Feature Name: {feature['Feature Name']}
+Feature Description: {feature['Feature Description']}
+Feature Acceptance Criteria:
+{feature['Feature Acceptance Criteria']}
+
+Rules:
+- Create a sensible set of stories (typically 5–10) that cover end-to-end delivery.
+- Use classic format: As a <role>, I want <capability>, so that <benefit>.
+- Include acceptance criteria (3–6 bullets per story).
+- Mention dependencies only if truly required.
+- If discovery/unknowns exist, include a spike explicitly with type="spike".
+- Do NOT include any story point estimation.
+- Output MUST be valid JSON only.
+
+Return JSON in this exact shape:
+{{
+  "feature_id": "...",
+  "feature_name": "...",
+  "stories": [
+    {{
+      "story_id": "USR-001",
+      "title": "...",
+      "user_story": "As a ...",
+      "acceptance_criteria": ["..."],
+      "type": "story|spike",
+      "dependencies": ["..."]
+    }}
+  ]
+}}
+"""
+
+    content = _openai_chat(
+        messages=[
+            {"role": "system", "content": BREAKDOWN_SYSTEM_PROMPT},
+            {"role": "user", "content": user},
+        ],
+        temperature=0.2,
+        max_tokens=1700,
+    )
+
+    payload = _safe_json_loads(content)
+    payload.setdefault("feature_id", feature["Feature ID"])
+    payload.setdefault("feature_name", feature["Feature Name"])
+
+    stories = payload.get("stories") or []
+    if not isinstance(stories, list):
+        stories = []
+
+    # normalize
+    for i, s in enumerate(stories, start=1):
+        if not isinstance(s, dict):
+            continue
+        s.setdefault("story_id", f"USR-{i:03d}")
+        s.setdefault("type", "story")
+        s.setdefault("dependencies", [])
+        s.pop("suggested_sp", None)
+
+    payload["stories"] = stories
+    return payload
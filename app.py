@@ -1,278 +1,59 @@
-from flask import Flask, render_template, send_file, request, redirect, url_for, session, jsonify
-import pandas as pd
+import click
+from flask import Blueprint, Flask, Response, current_app, render_template, send_file, request, redirect, url_for, session, jsonify
 import os
+import sys
 import json
-import re
-import requests
 from datetime import datetime
 
-app = Flask(__name__)
-app.secret_key = "local-dev-secret-key"
+import metrics
+import profiling
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(BASE_DIR, "data")
-EXCEL_PATH = os.path.join(DATA_DIR, "wsjf_features.xlsx")
-USER_STORIES_PATH = os.path.join(DATA_DIR, "user_stories.json")
-
-os.makedirs(DATA_DIR, exist_ok=True)
-
-# ==================================================
-# OPENAI (API) - lightweight requests client
-# ==================================================
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "").strip()
-OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini").strip()
-
-# ==================================================
-# AI FEATURE QUALITY (IN-MEMORY CACHE)
-# ==================================================
-AI_QUALITY_CACHE = {}  # { feature_id: {"result": {...}, "ts": "..."} }
-
-AI_QUALITY_SYSTEM_PROMPT = (
-    "You are an expert SAFe Program Consultant, Senior Agile Coach, and Enterprise Product Strategist.\n\n"
-    "You specialize in:\n"
-    "- WSJF prioritization\n"
-    "- SAFe Feature definition standards\n"
-    "- INVEST and SMART criteria\n"
-    "- Acceptance criteria quality\n"
-    "- Outcome-driven product management\n"
-    "- Risk and dependency analysis\n"
-    "- Enterprise architecture alignment\n\n"
-    "Your job is to critically assess the quality of a Feature used in PI Planning.\n\n"
-    "Be direct, analytical, and practical.\n"
-    "Do NOT give generic advice.\n"
-    "Be specific and actionable.\n"
-    "Score objectively.\n\n"
-    "Return structured output in JSON format only."
-)
-
-
-def _openai_chat(messages, temperature: float = 0.2, max_tokens: int = 1600) -> str:
-    """Calls OpenAI Chat Completions via HTTPS.
-
-    Note: keep implementation dependency-free. Requires OPENAI_API_KEY.
-    """
-    if not OPENAI_API_KEY:
-        raise RuntimeError("Missing OPENAI_API_KEY environment variable")
-
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {OPENAI_API_KEY}",
-        "Content-Type": "application/json",
-    }
-    payload = {
-        "model": OPENAI_MODEL,
-        "messages": messages,
-        "temperature": temperature,
-        "max_tokens": max_tokens,
-        "response_format": {"type": "json_object"},
-    }
-    r = requests.post(url, headers=headers, json=payload, timeout=60)
-    if r.status_code >= 400:
-        raise RuntimeError(f"OpenAI error {r.status_code}: {r.text}")
-    data = r.json()
-    return data["choices"][0]["message"]["content"]
-
-
-def _safe_json_loads(text: str):
-    """Robust JSON parsing: prefers full string; falls back to extracting first JSON object."""
-    try:
-        return json.loads(text)
-    except Exception:
-        m = re.search(r"\{[\s\S]*\}", text)
-        if not m:
-            raise
-        return json.loads(m.group(0))
+# pandas (wsjf_store) and requests (ai) are imported inside the routes that
+# need them so app start-up and poker-only traffic stay light.
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-def _safe_num(v):
-    try:
-        if v is None or (isinstance(v, float) and pd.isna(v)):
-            return 0.0
-        return float(v)
-    except Exception:
-        return 0.0
+bp = Blueprint("main", __name__, cli_group=None)
 
 
 def _read_user_stories():
-    if not os.path.exists(USER_STORIES_PATH):
+    path = current_app.config["USER_STORIES_PATH"]
+    if not os.path.exists(path):
         return {"features": {}}
     try:
-        with open(USER_STORIES_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with metrics.STORAGE_DURATION.time(op="read_user_stories"):
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
     except Exception:
         # if file is corrupted, do not crash the app
         return {"features": {}}
 
 
 def _write_user_stories(payload: dict):
-    tmp = USER_STORIES_PATH + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2, ensure_ascii=False)
-    os.replace(tmp, USER_STORIES_PATH)
-
-
-def _get_feature_by_id(feature_id: str):
-    df = ensure_excel_with_features()
-    row = df[df["Feature ID"] == feature_id]
-    if row.empty:
-        return None
-    r = row.iloc[0].to_dict()
-    return {
-        "Feature ID": str(r.get("Feature ID", "")),
-        "Feature Name": str(r.get("Feature Name", "")),
-        "Feature Description": str(r.get("Feature Description", "")),
-        "Feature Acceptance Criteria": str(r.get("Feature Acceptance Criteria", "")),
-    }
+    path = current_app.config["USER_STORIES_PATH"]
+    tmp = path + ".tmp"
+    with metrics.STORAGE_DURATION.time(op="write_user_stories"):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, path)
 
 
-def build_ai_feature_quality_user_prompt(row: dict) -> str:
-    feature_id = str(row.get("Feature ID", "")).strip()
-    feature_name = str(row.get("Feature Name", "")).strip()
-    feature_description = str(row.get("Feature Description", "")).strip()
-    acceptance_criteria = str(row.get("Feature Acceptance Criteria", "")).strip()
-
-    business_value = _safe_num(row.get("Business Value"))
-    time_criticality = _safe_num(row.get("Time Complexity"))
-    oe_rr = _safe_num(row.get("OE/RR Value"))
-    job_size = _safe_num(row.get("Job Size"))
-    story_points = _safe_num(row.get("Story Points"))
-
-    cost_of_delay = business_value + time_criticality + oe_rr
-    wsjf = round(cost_of_delay / job_size, 2) if job_size > 0 else 0
-
-    return f"""You are assessing the following Feature used in PI Planning.
-
-Feature ID: {feature_id}
-Feature Name: {feature_name}
-
-Description:
-{feature_description}
-
-Acceptance Criteria:
-{acceptance_criteria}
-
-Current WSJF Inputs:
-- Business Value: {business_value}
-- Time Criticality: {time_criticality}
-- OE / RR Value: {oe_rr}
-- Job Size: {job_size}
-- Story Points: {story_points}
-- Calculated Cost of Delay: {round(cost_of_delay, 2)}
-- Calculated WSJF: {wsjf}
-
----
-
-Evaluate this Feature on the following dimensions (score 1–5 where 5 is excellent):
-
-1. Strategic Alignment (Does it clearly link to business outcome or OKR?)
-2. Clarity of Problem Statement
-3. Quality of Acceptance Criteria
-4. Testability & Measurability
-5. Size Appropriateness (Is it feature-sized or too large/small?)
-6. Risk Visibility (Dependencies, compliance, architecture impact)
-7. WSJF Input Justification (Do the numbers logically match the feature?)
-
-For each dimension:
-- Give a score (1–5)
-- Provide 2–3 lines explaining WHY
-- Suggest 1 concrete improvement
-
-Then provide:
-
-- Overall Feature Quality Score (average out of 5)
-- Maturity Level:
-    1. Weak
-    2. Needs Refinement
-    3. PI-Ready with Risks
-    4. Strong
-    5. Exemplary
-
-- Top 3 Improvements Required Before PI Commitment
-- A rewritten improved Feature version (concise, high-quality)
-
-Return response strictly in JSON with this structure:
-
-{{
-  "dimension_scores": [
-    {{
-      "dimension": "",
-      "score": 0,
-      "reason": "",
-      "improvement": ""
-    }}
-  ],
-  "overall_score": 0,
-  "maturity_level": "",
-  "top_3_improvements": [],
-  "improved_feature_version": ""
-}}
-"""
-
-
-# ==================================================
-# SAFe FEATURE GENERATOR (SYSTEM-OWNED)
-# ==================================================
-def generate_safe_features_df():
-    return pd.DataFrame([
-        {
-            "Feature ID": "FTR-PI-001",
-            "Feature Name": "Payments Modernization",
-            "Feature Description": "As a finance stakeholder, I want modern payment processing so that regulatory and customer expectations are met.",
-            "Feature Acceptance Criteria": "• Regulatory compliance met\n• Zero manual reconciliation\n• Peak load validated",
-        },
-        {
-            "Feature ID": "FTR-PI-002",
-            "Feature Name": "Customer Analytics Platform",
-            "Feature Description": "As a business owner, I want unified customer analytics so that decisions are data-driven.",
-            "Feature Acceptance Criteria": "• Single source of truth\n• GDPR compliant\n• Business dashboards available",
-        },
-        {
-            "Feature ID": "FTR-PI-003",
-            "Feature Name": "Legacy System Decommissioning",
-            "Feature Description": "As an IT leader, I want to retire legacy systems so that risk and cost are reduced.",
-            "Feature Acceptance Criteria": "• No active consumers\n• Data archived\n• Support contracts closed",
-        },
-        {
-            "Feature ID": "FTR-PI-004",
-            "Feature Name": "AI Assisted Support",
-            "Feature Description": "As a support manager, I want AI assistance so that resolution time improves.",
-            "Feature Acceptance Criteria": "• Accuracy threshold met\n• Human override enabled\n• Audit logs available",
-        },
-        {
-            "Feature ID": "FTR-PI-005",
-            "Feature Name": "Mobile Experience Revamp",
-            "Feature Description": "As a customer, I want a modern mobile experience so that interactions are intuitive.",
-            "Feature Acceptance Criteria": "• UX council approved\n• Performance benchmarks met\n• Rating improvement tracked",
-        }
-    ])
+def _story_index(db: dict):
+    """Near-duplicate index over the user story store.
 
+    Built once per process; afterwards only features another worker has
+    accepted since (a different ``accepted_at``) are re-indexed.
+    """
+    from story_index import StoryIndex
 
-# ==================================================
-# ENSURE EXCEL EXISTS & HAS FEATURES
-# ==================================================
-def ensure_excel_with_features():
-    if not os.path.exists(EXCEL_PATH):
-        df = generate_safe_features_df()
+    index = current_app.extensions.get("story_index")
+    if index is None:
+        index = StoryIndex(dims=current_app.config["STORY_INDEX_DIMS"])
+        index.rebuild(db.get("features") or {})
+        current_app.extensions["story_index"] = index
     else:
-        df = pd.read_excel(EXCEL_PATH)
-        if df.empty:
-            df = generate_safe_features_df()
-
-    required_cols = [
-        "Business Value",
-        "Time Complexity",
-        "OE/RR Value",
-        "Job Size",
-        "Cost of Delay",
-        "WSJF",
-        "Story Points",
-    ]
-    for col in required_cols:
-        if col not in df.columns:
-            df[col] = ""
-
-    df.to_excel(EXCEL_PATH, index=False)
-    return df
+        index.sync(db.get("features") or {})
+    return index
 
 
 # ================================
@@ -291,6 +72,12 @@ ESTIMATION_FIELDS = [
 ]
 
 
+metrics.POKER_SESSIONS_ACTIVE.set_function(lambda: len(POKER_SESSIONS))
+metrics.POKER_USERS_ACTIVE.set_function(
+    lambda: sum(len(s.get("users", ())) for s in list(POKER_SESSIONS.values()))
+)
+
+
 def nearest_fibo(v: float) -> int:
     return min(FIBO_DECK, key=lambda x: abs(x - v))
 
@@ -308,7 +95,7 @@ def _require_host(session_id: str):
     return session.get("user") == s.get("host_name")
 
 
-@app.route("/", methods=["GET", "POST"])
+@bp.route("/", methods=["GET", "POST"])
 def home():
     PROJECTS = [
         "Digital Channels",
@@ -320,7 +107,7 @@ def home():
     if request.method == "POST":
         selected = request.form.get("project", "").strip()
         session["selected_project"] = selected if selected else "—"
-        return redirect(url_for("wsjf"))
+        return redirect(url_for(".wsjf"))
 
     # 👇 hide top nav on this page
     return render_template("home.html", projects=PROJECTS, hide_nav=True)
@@ -329,85 +116,144 @@ def home():
 # ==================================================
 # WSJF PAGE
 # ==================================================
-@app.route("/wsjf")
+@bp.route("/wsjf")
 def wsjf():
-    df = ensure_excel_with_features()
+    """Streams the ranked feature list; only the first rows are inlined.
 
-    for col in ["Business Value", "Time Complexity", "OE/RR Value", "Job Size"]:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
+    ``?rows=N`` overrides WSJF_INITIAL_ROWS, ``?rows=all`` inlines everything.
+    The remaining rows are fetched page by page from /api/wsjf/rows.
+    """
+    from page_render import LazyRows, render_fragment, stream_page
 
-    bv = df["Business Value"].fillna(0)
-    tc = df["Time Complexity"].fillna(0)
-    oe = df["OE/RR Value"].fillna(0)
+    def load():
+        from wsjf_store import ranked_features
 
-    df["Cost of Delay"] = bv + tc + oe
+        return ranked_features(persist=True)
 
-    df["WSJF"] = df.apply(
-        lambda row: round(row["Cost of Delay"] / row["Job Size"], 2)
-        if pd.notna(row["Job Size"]) and row["Job Size"] > 0
-        else 0,
-        axis=1
-    )
+    rows_arg = request.args.get("rows", "")
+    if rows_arg == "all":
+        limit = None
+    else:
+        try:
+            limit = max(0, int(rows_arg))
+        except ValueError:
+            limit = current_app.config["WSJF_INITIAL_ROWS"]
+
+    features = LazyRows(load, limit=limit)
+    return Response(stream_page(
+        "wsjf.html",
+        features,
+        features=features,
+        render_row=lambda f: render_fragment("_wsjf_row.html", f),
+        page_size=current_app.config["WSJF_PAGE_SIZE"],
+    ))
+
+
+@bp.route("/api/wsjf/rows")
+def api_wsjf_rows():
+    """JSON feed of pre-rendered WSJF rows for lazy loading."""
+    from page_render import render_fragment
+    from wsjf_store import ranked_features
 
     try:
-        df.to_excel(EXCEL_PATH, index=False)
-    except PermissionError:
-        pass
+        offset = max(0, int(request.args.get("offset", 0)))
+        limit = max(1, int(request.args.get("limit", current_app.config["WSJF_PAGE_SIZE"])))
+    except ValueError:
+        return jsonify({"error": "offset and limit must be integers"}), 400
 
-    df = df.sort_values(by="WSJF", ascending=False)
-    features = df.to_dict(orient="records")
-    return render_template("wsjf.html", features=features)
+    records = ranked_features()
+    page = records[offset:offset + limit]
+    end = offset + len(page)
+
+    return jsonify({
+        "offset": offset,
+        "total": len(records),
+        "next_offset": end if end < len(records) else None,
+        "rows": [
+            {"feature_id": str(f.get("Feature ID", "")), "html": str(render_fragment("_wsjf_row.html", f))}
+            for f in page
+        ],
+    })
 
 
 # ==================================================
 # API: AI Feature Quality Assessment
 # ==================================================
-@app.route("/api/feature_quality/<feature_id>", methods=["POST"])
+@bp.route("/api/feature_quality/batch", methods=["POST"])
+def api_feature_quality_batch():
+    """Assesses several features, packing them into as few AI calls as possible.
+
+    Body: ``{"feature_ids": [...]}``, at most ``AI_BATCH_MAX_FEATURES`` ids.
+    """
+    from ai import AI_QUALITY_CACHE, assess_features_packed
+    from wsjf_store import ranked_features
+
+    data = request.get_json(silent=True) or {}
+    wanted = data.get("feature_ids")
+    if not isinstance(wanted, list) or not wanted:
+        return jsonify({"error": "feature_ids must be a non-empty list"}), 400
+    wanted = list(dict.fromkeys(str(fid).strip() for fid in wanted))
+    limit = current_app.config["AI_BATCH_MAX_FEATURES"]
+    if len(wanted) > limit:
+        return jsonify({"error": f"At most {limit} feature_ids per request"}), 400
+
+    records = ranked_features()
+    by_id = {str(r.get("Feature ID", "")): r for r in records}
+    rows = [by_id[fid] for fid in wanted if fid in by_id]
+    not_found = [fid for fid in wanted if fid not in by_id]
+
+    results, misses = {}, []
+    for row in rows:
+        fid = str(row.get("Feature ID", ""))
+        cache_hit = AI_QUALITY_CACHE.get(fid)
+        if cache_hit and isinstance(cache_hit, dict) and cache_hit.get("result"):
+            metrics.CACHE_REQUESTS.inc(cache="ai_quality", result="hit")
+            results[fid] = {"cached": True, **cache_hit["result"]}
+        else:
+            metrics.CACHE_REQUESTS.inc(cache="ai_quality", result="miss")
+            misses.append(row)
+
+    from llm_backends import llm_configured
+
+    if misses and not llm_configured():
+        return jsonify({"error": "Missing OPENAI_API_KEY environment variable"}), 500
+
+    packed = assess_features_packed(misses) if misses else {"results": {}, "errors": {}, "calls": 0}
+    for fid, result in packed["results"].items():
+        results[fid] = {"cached": False, **result}
+
+    return jsonify({
+        "results": results,
+        "errors": packed["errors"],
+        "not_found": not_found,
+        "calls": packed["calls"],
+    })
+
+
+@bp.route("/api/feature_quality/<feature_id>", methods=["POST"])
 def api_feature_quality(feature_id):
+    from ai import AI_QUALITY_CACHE, assess_feature_quality
+
     cache_hit = AI_QUALITY_CACHE.get(feature_id)
     if cache_hit and isinstance(cache_hit, dict) and cache_hit.get("result"):
+        metrics.CACHE_REQUESTS.inc(cache="ai_quality", result="hit")
         return jsonify({"cached": True, **cache_hit["result"]})
+    metrics.CACHE_REQUESTS.inc(cache="ai_quality", result="miss")
 
-    feature = _get_feature_by_id(feature_id)
-    if not feature:
-        return jsonify({"error": "Feature not found"}), 404
-
-    if not OPENAI_API_KEY:
-        return jsonify({"error": "Missing OPENAI_API_KEY environment variable"}), 500
+    from wsjf_store import ensure_excel_with_features
 
     df = ensure_excel_with_features()
     row_df = df[df["Feature ID"] == feature_id]
     if row_df.empty:
         return jsonify({"error": "Feature not found"}), 404
 
-    row = row_df.iloc[0].to_dict()
-    user_prompt = build_ai_feature_quality_user_prompt(row)
+    from llm_backends import llm_configured
 
-    try:
-        content = _openai_chat(
-            messages=[
-                {"role": "system", "content": AI_QUALITY_SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.2,
-            max_tokens=1800,
-        )
-
-        data = _safe_json_loads(content)
-
-        result = {
-            "feature_id": feature_id,
-            "feature_name": str(row.get("Feature Name", "")),
-            "assessment": {
-                "dimension_scores": data.get("dimension_scores", []),
-                "overall_score": data.get("overall_score", 0),
-                "maturity_level": data.get("maturity_level", ""),
-                "top_3_improvements": data.get("top_3_improvements", []),
-                "improved_feature_version": data.get("improved_feature_version", ""),
-            },
-        }
+    if not llm_configured():
+        return jsonify({"error": "Missing OPENAI_API_KEY environment variable"}), 500
 
-        AI_QUALITY_CACHE[feature_id] = {"result": result, "ts": datetime.utcnow().isoformat() + "Z"}
+    try:
+        result = assess_feature_quality(row_df.iloc[0].to_dict())
         return jsonify({"cached": False, **result})
 
     except RuntimeError as e:
@@ -419,7 +265,7 @@ def api_feature_quality(feature_id):
 # ==================================================
 # CAPACITY PAGE (UNCHANGED)
 # ==================================================
-@app.route("/capacity")
+@bp.route("/capacity")
 def capacity():
     import math
 
@@ -463,44 +309,86 @@ def capacity():
 # ==================================================
 # PI PLANNING PAGE
 # ==================================================
-@app.route("/pi")
+@bp.route("/pi")
 def pi_planning():
-    df = ensure_excel_with_features()
+    # the board fills itself from /api/planning/*, so the page needs no table data
+    return render_template("pi_planning.html")
 
-    for col in ["Business Value", "Time Complexity", "OE/RR Value", "Job Size"]:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
 
-    bv = df["Business Value"].fillna(0)
-    tc = df["Time Complexity"].fillna(0)
-    oe = df["OE/RR Value"].fillna(0)
+# ==================================================
+# EXPORT EXCEL
+# ==================================================
+@bp.route("/export/wsjf")
+def export_wsjf():
+    return send_file(current_app.config["EXCEL_PATH"], as_attachment=True)
 
-    df["Cost of Delay"] = bv + tc + oe
 
-    df["WSJF"] = df.apply(
-        lambda row: round(row["Cost of Delay"] / row["Job Size"], 2)
-        if pd.notna(row["Job Size"]) and row["Job Size"] > 0
-        else 0,
-        axis=1
-    )
+# ==================================================
+# BULK IMPORT (CSV / XLSX)
+# ==================================================
+def _run_feature_import(source, filename: str, batch_size: int) -> dict:
+    from feature_import import import_features
 
-    df = df.sort_values(by="WSJF", ascending=False)
-    features = df[["Feature ID", "Feature Name", "WSJF", "Story Points"]].to_dict(orient="records")
+    report, touched = import_features(source, filename, ESTIMATION_FIELDS, batch_size=batch_size)
 
-    return render_template("pi_planning.html", features=features)
+    if "ai" in sys.modules:
+        # only features whose content changed need re-assessment
+        from ai import AI_QUALITY_CACHE
 
+        for fid in touched:
+            AI_QUALITY_CACHE.pop(fid, None)
 
-# ==================================================
-# EXPORT EXCEL
-# ==================================================
-@app.route("/export/wsjf")
-def export_wsjf():
-    return send_file(EXCEL_PATH, as_attachment=True)
+    return report
+
+
+@bp.route("/api/features/import", methods=["POST"])
+def api_features_import():
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        return jsonify({"error": "file is required (multipart/form-data)"}), 400
+
+    try:
+        batch_size = int(request.args.get("batch_size", 1000))
+    except ValueError:
+        return jsonify({"error": "batch_size must be an integer"}), 400
+
+    try:
+        report = _run_feature_import(upload.stream, upload.filename, batch_size)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except PermissionError:
+        return jsonify({"error": "Excel file open; close it and try again."}), 409
+
+    return jsonify({"status": "imported", **report})
+
+
+@bp.cli.command("import-features")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--batch-size", default=1000, show_default=True, help="Rows per upsert batch.")
+def import_features_command(path, batch_size):
+    """Bulk upsert features from a CSV or xlsx file."""
+    with open(path, "rb") as f:
+        try:
+            report = _run_feature_import(f, path, batch_size)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        except PermissionError:
+            raise click.ClickException("Excel file open; close it and try again.")
+
+    click.echo(
+        f"{report['rows']} rows: {report['inserted']} inserted, "
+        f"{report['updated']} updated, {report['failed']} failed"
+    )
+    for err in report["errors"]:
+        click.echo(f"  row {err['row']} [{err['feature_id'] or '-'}]: {err['error']}", err=True)
+    if report["errors_truncated"]:
+        click.echo("  (further errors not shown)", err=True)
 
 
 # ==================================================
 # POKER: Start a session per feature
 # ==================================================
-@app.route("/start_poker/<feature_id>")
+@bp.route("/start_poker/<feature_id>")
 def start_poker(feature_id):
     session_id = f"POKER-{feature_id}"
 
@@ -514,10 +402,10 @@ def start_poker(feature_id):
             "consensus": {}
         }
 
-    return redirect(url_for("poker_lobby", session_id=session_id))
+    return redirect(url_for(".poker_lobby", session_id=session_id))
 
 
-@app.route("/poker/<session_id>", methods=["GET", "POST"])
+@bp.route("/poker/<session_id>", methods=["GET", "POST"])
 def poker_lobby(session_id):
     s = POKER_SESSIONS.get(session_id)
     if not s:
@@ -536,18 +424,20 @@ def poker_lobby(session_id):
         if not s.get("host_name"):
             s["host_name"] = name
 
-        return redirect(url_for("poker_room", session_id=session_id))
+        return redirect(url_for(".poker_room", session_id=session_id))
 
     return render_template("poker_lobby.html", session_id=session_id, error=None, host_name=s.get("host_name"))
 
 
-@app.route("/poker/<session_id>/room")
+@bp.route("/poker/<session_id>/room")
 def poker_room(session_id):
     s = POKER_SESSIONS.get(session_id)
     if not s:
         return "Session not found", 404
     if "user" not in session:
-        return redirect(url_for("poker_lobby", session_id=session_id))
+        return redirect(url_for(".poker_lobby", session_id=session_id))
+
+    from wsjf_store import ensure_excel_with_features
 
     df = ensure_excel_with_features()
     row = df[df["Feature ID"] == s["feature_id"]]
@@ -575,7 +465,7 @@ def poker_room(session_id):
     )
 
 
-@app.route("/api/state/<session_id>")
+@bp.route("/api/state/<session_id>")
 def api_state(session_id):
     s = POKER_SESSIONS.get(session_id)
     if not s:
@@ -608,7 +498,7 @@ def api_state(session_id):
     })
 
 
-@app.route("/api/vote", methods=["POST"])
+@bp.route("/api/vote", methods=["POST"])
 def api_vote():
     if "user" not in session:
         return jsonify({"error": "Not joined"}), 401
@@ -638,7 +528,7 @@ def api_vote():
     return jsonify({"status": "ok"})
 
 
-@app.route("/api/reveal/<session_id>")
+@bp.route("/api/reveal/<session_id>")
 def api_reveal(session_id):
     if not _require_host(session_id):
         return jsonify({"error": "Host only"}), 403
@@ -658,7 +548,7 @@ def api_reveal(session_id):
     return jsonify(consensus)
 
 
-@app.route("/api/commit/<session_id>")
+@bp.route("/api/commit/<session_id>")
 def api_commit(session_id):
     if not _require_host(session_id):
         return jsonify({"error": "Host only"}), 403
@@ -666,6 +556,8 @@ def api_commit(session_id):
     s = POKER_SESSIONS.get(session_id)
     fid = s["feature_id"]
 
+    from wsjf_store import ensure_excel_with_features, write_excel
+
     df = ensure_excel_with_features()
 
     for col, val in s.get("consensus", {}).items():
@@ -673,7 +565,7 @@ def api_commit(session_id):
             df.loc[df["Feature ID"] == fid, col] = val
 
     try:
-        df.to_excel(EXCEL_PATH, index=False)
+        write_excel(df, source=f"poker:{session_id}")
     except PermissionError:
         return jsonify({"error": "Excel file open; close it and try again."}), 409
 
@@ -683,7 +575,7 @@ def api_commit(session_id):
 # ==================================================
 # AI: Feature -> User Story breakdown (SIMPLE)
 # ==================================================
-@app.route("/api/ai/breakdown_feature", methods=["POST"])
+@bp.route("/api/ai/breakdown_feature", methods=["POST"])
 def api_ai_breakdown_feature():
     data = request.get_json(force=True)
     feature_id = (data.get("feature_id") or "").strip()
@@ -691,79 +583,17 @@ def api_ai_breakdown_feature():
     if not feature_id:
         return jsonify({"error": "feature_id is required"}), 400
 
-    feature = _get_feature_by_id(feature_id)
+    from ai import breakdown_feature
+    from wsjf_store import get_feature_by_id
+
+    feature = get_feature_by_id(feature_id)
     if not feature:
         return jsonify({"error": "Feature not found"}), 404
 
-    system = (
-        "You are an expert Agile Product Owner. "
-        "Break down a SAFe Feature into clear, sprint-implementable user stories. "
-        "Keep it simple and practical. Avoid over-engineering."
-    )
-
-    user = f"""
-Break down this Feature into user stories.
-
-Feature ID: {feature['Feature ID']}
-Feature Name: {feature['Feature Name']}
-Feature Description: {feature['Feature Description']}
-Feature Acceptance Criteria:
-{feature['Feature Acceptance Criteria']}
-
-Rules:
-- Create a sensible set of stories (typically 5–10) that cover end-to-end delivery.
-- Use classic format: As a <role>, I want <capability>, so that <benefit>.
-- Include acceptance criteria (3–6 bullets per story).
-- Mention dependencies only if truly required.
-- If discovery/unknowns exist, include a spike explicitly with type="spike".
-- Do NOT include any story point estimation.
-- Output MUST be valid JSON only.
-
-Return JSON in this exact shape:
-{{
-  "feature_id": "...",
-  "feature_name": "...",
-  "stories": [
-    {{
-      "story_id": "USR-001",
-      "title": "...",
-      "user_story": "As a ...",
-      "acceptance_criteria": ["..."],
-      "type": "story|spike",
-      "dependencies": ["..."]
-    }}
-  ]
-}}
-"""
-
     try:
-        content = _openai_chat(
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": user},
-            ],
-            temperature=0.2,
-            max_tokens=1700,
-        )
-
-        payload = _safe_json_loads(content)
-        payload.setdefault("feature_id", feature["Feature ID"])
-        payload.setdefault("feature_name", feature["Feature Name"])
-
-        stories = payload.get("stories") or []
-        if not isinstance(stories, list) or len(stories) == 0:
+        payload = breakdown_feature(feature)
+        if len(payload["stories"]) == 0:
             return jsonify({"error": "AI returned no stories"}), 502
-
-        # normalize
-        for i, s in enumerate(stories, start=1):
-            if not isinstance(s, dict):
-                continue
-            s.setdefault("story_id", f"USR-{i:03d}")
-            s.setdefault("type", "story")
-            s.setdefault("dependencies", [])
-            s.pop("suggested_sp", None)
-
-        payload["stories"] = stories
         return jsonify(payload)
 
     except RuntimeError as e:
@@ -775,7 +605,7 @@ Return JSON in this exact shape:
 # ==================================================
 # User Stories storage: Accept + Fetch (NO SP)
 # ==================================================
-@app.route("/api/user_stories/accept", methods=["POST"])
+@bp.route("/api/user_stories/accept", methods=["POST"])
 def api_user_stories_accept():
     data = request.get_json(force=True)
     feature_id = (data.get("feature_id") or "").strip()
@@ -798,19 +628,38 @@ def api_user_stories_accept():
             "dependencies": s.get("dependencies") if isinstance(s.get("dependencies"), list) else [],
         })
 
+    if not feature_name:
+        from wsjf_store import get_feature_by_id
+
+        feature_name = (get_feature_by_id(feature_id) or {}).get("Feature Name", "")
+
     db = _read_user_stories()
     db.setdefault("features", {})
-    db["features"][feature_id] = {
+
+    # flag likely duplicates of stories already accepted for other features
+    index = _story_index(db)
+    duplicates = index.find_duplicates(
+        norm,
+        exclude_feature=feature_id,
+        threshold=current_app.config["DUPLICATE_THRESHOLD"],
+    )
+
+    block = db["features"][feature_id] = {
         "feature_id": feature_id,
-        "feature_name": feature_name or (_get_feature_by_id(feature_id) or {}).get("Feature Name", ""),
+        "feature_name": feature_name,
         "accepted_at": datetime.utcnow().isoformat() + "Z",
         "stories": norm,
     }
     _write_user_stories(db)
-    return jsonify({"status": "saved", "feature_id": feature_id, "stories": len(norm)})
 
+    from story_index import feature_version
+
+    index.replace_feature(feature_id, norm, feature_version(block))
+
+    return jsonify({"status": "saved", "feature_id": feature_id, "stories": len(norm), "duplicates": duplicates})
 
-@app.route("/api/user_stories")
+
+@bp.route("/api/user_stories")
 def api_user_stories_all():
     db = _read_user_stories()
     features = (db.get("features") or {})
@@ -830,27 +679,21 @@ def api_user_stories_all():
 # ==================================================
 # Planning data feeds (Features vs User Stories)
 # ==================================================
-@app.route("/api/planning/features")
+@bp.route("/api/planning/features")
 def api_planning_features():
-    df = ensure_excel_with_features()
+    import pandas as pd
+    from wsjf_store import ranked_features
 
-    for col in ["Business Value", "Time Complexity", "OE/RR Value", "Job Size"]:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
-
-    bv = df["Business Value"].fillna(0)
-    tc = df["Time Complexity"].fillna(0)
-    oe = df["OE/RR Value"].fillna(0)
-    df["Cost of Delay"] = bv + tc + oe
-    df["WSJF"] = df.apply(
-        lambda row: round(row["Cost of Delay"] / row["Job Size"], 2)
-        if pd.notna(row["Job Size"]) and row["Job Size"] > 0
-        else 0,
-        axis=1
-    )
-    df = df.sort_values(by="WSJF", ascending=False)
+    records = ranked_features()
+    try:
+        offset = max(0, int(request.args.get("offset", 0)))
+        limit = int(request.args["limit"]) if "limit" in request.args else None
+    except ValueError:
+        return jsonify({"error": "offset and limit must be integers"}), 400
+    page = records[offset:] if limit is None else records[offset:offset + max(0, limit)]
 
     out = []
-    for _, r in df.iterrows():
+    for r in page:
         sp = r.get("Story Points")
         try:
             sp = int(sp) if pd.notna(sp) else 0
@@ -864,10 +707,10 @@ def api_planning_features():
             "wsjf": float(r.get("WSJF") or 0),
             "sp": sp,
         })
-    return jsonify({"items": out})
+    return jsonify({"items": out, "total": len(records)})
 
 
-@app.route("/api/planning/stories")
+@bp.route("/api/planning/stories")
 def api_planning_stories():
     db = _read_user_stories()
     features = (db.get("features") or {})
@@ -888,6 +731,159 @@ def api_planning_stories():
     return jsonify({"items": out, "feature_count": len(features)})
 
 
+# ==================================================
+# WSJF HISTORY (estimation rounds over time)
+# ``at`` / ``from`` / ``to`` take a PI label or an ISO timestamp.
+# ==================================================
+def _wsjf_history():
+    from history import get_history
+    from wsjf_store import ranked_features
+
+    # reading the table records edits made to the Excel file since the last read
+    ranked_features()
+    return get_history()
+
+
+@bp.route("/api/history/wsjf")
+def api_history_wsjf():
+    from history import rank_state
+
+    history = _wsjf_history()
+    at = (request.args.get("at") or "").strip()
+    try:
+        seq = history.resolve(at) if at else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    state, seq, ts = history.state_at(seq=seq)
+    return jsonify({"seq": seq, "ts": ts, "items": rank_state(state)})
+
+
+@bp.route("/api/history/labels", methods=["GET", "POST"])
+def api_history_labels():
+    history = _wsjf_history()
+    if request.method == "GET":
+        return jsonify(history.labels())
+
+    data = request.get_json(force=True)
+    name = (data.get("label") or "").strip()
+    if not name:
+        return jsonify({"error": "label is required"}), 400
+    try:
+        label = history.add_label(name, (data.get("at") or "").strip() or None)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"label": name, **label})
+
+
+@bp.route("/api/history/diff")
+def api_history_diff():
+    from history import diff_rankings, rank_state
+
+    history = _wsjf_history()
+    ref_from = (request.args.get("from") or "").strip()
+    ref_to = (request.args.get("to") or "").strip()
+    if not ref_from:
+        return jsonify({"error": "from is required"}), 400
+    try:
+        seq_from = history.resolve(ref_from)
+        seq_to = history.resolve(ref_to) if ref_to else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    old, seq_from, ts_from = history.state_at(seq=seq_from)
+    new, seq_to, ts_to = history.state_at(seq=seq_to)
+    return jsonify({
+        "from": {"ref": ref_from, "seq": seq_from, "ts": ts_from},
+        "to": {"ref": ref_to or "latest", "seq": seq_to, "ts": ts_to},
+        "features": diff_rankings(rank_state(old), rank_state(new)),
+    })
+
+
+# ==================================================
+# RANK STABILITY (Monte Carlo over estimate spread)
+# ==================================================
+@bp.route("/api/simulation/wsjf")
+def api_simulation_wsjf():
+    from simulation import build_distributions, simulate_rankings
+    from wsjf_store import ranked_features
+
+    try:
+        trials = int(request.args.get("trials", current_app.config["SIMULATION_TRIALS"]))
+        cut = int(request.args["cut"]) if "cut" in request.args else None
+        capacity_sp = float(request.args["capacity_sp"]) if "capacity_sp" in request.args else None
+        seed = int(request.args["seed"]) if "seed" in request.args else None
+    except ValueError:
+        return jsonify({"error": "trials, cut, capacity_sp and seed must be numbers"}), 400
+    if not 1 <= trials <= current_app.config["SIMULATION_MAX_TRIALS"]:
+        return jsonify({"error": f"trials must be between 1 and {current_app.config['SIMULATION_MAX_TRIALS']}"}), 400
+
+    # ranked_features() is cached; _wsjf_history() has just refreshed it
+    history = _wsjf_history()
+    features = build_distributions(
+        ranked_features(),
+        POKER_SESSIONS,
+        history.field_values(),
+    )
+    # the per-feature rank histogram is large; only send it when asked for
+    distribution = request.args.get("distribution", "").strip().lower() in ("1", "true", "yes")
+    result = simulate_rankings(
+        features, trials=trials, cut=cut, capacity_sp=capacity_sp, seed=seed, distribution=distribution
+    )
+    return jsonify({"cut": cut, "capacity_sp": capacity_sp, **result})
+
+
+# ==================================================
+# APP FACTORY
+# ==================================================
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").strip().lower() in ("1", "true", "yes")
+
+
+def create_app(config=None):
+    """Builds the Flask app. ``config`` overrides the env-derived defaults."""
+    app = Flask(__name__)
+    app.config.from_mapping(
+        SECRET_KEY=os.getenv("SECRET_KEY", "local-dev-secret-key"),
+        DATA_DIR=os.path.join(BASE_DIR, "data"),
+        OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "").strip(),
+        OPENAI_MODEL=os.getenv("OPENAI_MODEL", "gpt-4o-mini").strip(),
+        OPENAI_BASE_URL=os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").strip(),
+        LLM_MODE=os.getenv("LLM_MODE", "live").strip().lower(),
+        PROFILING_ENABLED=_env_flag("PROFILING_ENABLED"),
+        PROFILING_TOKEN=os.getenv("PROFILING_TOKEN", "").strip(),
+        PROFILING_TASKS=_env_flag("PROFILING_TASKS"),
+        WSJF_INITIAL_ROWS=int(os.getenv("WSJF_INITIAL_ROWS", "50")),
+        WSJF_PAGE_SIZE=int(os.getenv("WSJF_PAGE_SIZE", "100")),
+        AI_PACK_INPUT_TOKENS=int(os.getenv("AI_PACK_INPUT_TOKENS", "6000")),
+        AI_PACK_OUTPUT_TOKENS_PER_FEATURE=int(os.getenv("AI_PACK_OUTPUT_TOKENS_PER_FEATURE", "1200")),
+        AI_PACK_MAX_OUTPUT_TOKENS=int(os.getenv("AI_PACK_MAX_OUTPUT_TOKENS", "12000")),
+        AI_PACK_MAX_FEATURES=int(os.getenv("AI_PACK_MAX_FEATURES", "8")),
+        AI_BATCH_MAX_FEATURES=int(os.getenv("AI_BATCH_MAX_FEATURES", "50")),
+        DUPLICATE_THRESHOLD=float(os.getenv("DUPLICATE_THRESHOLD", "0.8")),
+        STORY_INDEX_DIMS=int(os.getenv("STORY_INDEX_DIMS", "512")),
+        HISTORY_SNAPSHOT_EVERY=int(os.getenv("HISTORY_SNAPSHOT_EVERY", "100")),
+        SIMULATION_TRIALS=int(os.getenv("SIMULATION_TRIALS", "10000")),
+        SIMULATION_MAX_TRIALS=int(os.getenv("SIMULATION_MAX_TRIALS", "100000")),
+        SIMULATION_HISTORY_DEPTH=int(os.getenv("SIMULATION_HISTORY_DEPTH", "5")),
+    )
+    if config:
+        app.config.update(config)
+
+    data_dir = app.config["DATA_DIR"]
+    app.config.setdefault("EXCEL_PATH", os.path.join(data_dir, "wsjf_features.xlsx"))
+    app.config.setdefault("USER_STORIES_PATH", os.path.join(data_dir, "user_stories.json"))
+    app.config.setdefault("PROFILING_DIR", os.path.join(data_dir, "profiles"))
+    app.config.setdefault("LLM_FIXTURES_DIR", os.path.join(data_dir, "llm_fixtures"))
+    app.config.setdefault("HISTORY_DIR", os.path.join(data_dir, "history"))
+    os.makedirs(data_dir, exist_ok=True)
+
+    metrics.init_app(app)
+    profiling.init_app(app)
+    app.register_blueprint(bp)
+    return app
+
+
 # ==================================================
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""Start-up benchmark: cold import, app construction and first requests.
+
+Each run happens in a fresh interpreter against a throw-away copy of
+``data/`` so the numbers reflect a real worker boot and the tracked files
+are never touched.
+
+    python bench_startup.py            # 5 runs
+    python bench_startup.py --runs 10
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import app as app_module
+t1 = time.perf_counter()
+flask_app = app_module.create_app({"DATA_DIR": sys.argv[1]})
+t2 = time.perf_counter()
+client = flask_app.test_client()
+client.get("/start_poker/FTR-PI-001", follow_redirects=True).get_data()
+t3 = time.perf_counter()
+pandas_after_poker = "pandas" in sys.modules
+client.get("/wsjf").get_data()  # streamed: the table is built while the body is read
+t4 = time.perf_counter()
+print(json.dumps({
+    "import_s": t1 - t0,
+    "create_app_s": t2 - t1,
+    "first_poker_request_s": t3 - t2,
+    "first_wsjf_request_s": t4 - t3,
+    "pandas_after_poker": pandas_after_poker,
+}))
+"""
+
+
+def run_once() -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = os.path.join(tmp, "data")
+        shutil.copytree(os.path.join(BASE_DIR, "data"), data_dir)
+        out = subprocess.run(
+            [sys.executable, "-c", CHILD, data_dir],
+            cwd=BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+
+    print(f"runs: {args.runs}")
+    for key in ("import_s", "create_app_s", "first_poker_request_s", "first_wsjf_request_s"):
+        values = [r[key] * 1000 for r in runs]
+        print(f"{key[:-2]:<24} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms")
+    print(f"pandas loaded by poker traffic: {any(r['pandas_after_poker'] for r in runs)}")
+
+
+if __name__ == "__main__":
+    main()
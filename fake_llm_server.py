@@ -0,0 +1,57 @@
+"""Local stand-in for the OpenAI Chat Completions API.
+
+Serves the same canned, schema-valid answers as ``LLM_MODE=fake`` but over
+HTTP, so the live code path (requests, timeouts, status handling) can be
+load-tested without network access:
+
+    python fake_llm_server.py --port 8089 --latency-ms 800 --error-rate 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=fake flask --app app run
+
+With ``--fixtures DIR`` a recorded fixture (see ``LLM_MODE=record``) is served
+whenever the request matches one.
+"""
+import argparse
+import random
+import time
+
+from flask import Flask, jsonify, request
+
+from llm_backends import FixtureStore, fake_completion
+
+
+def create_fake_server(latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0, fixtures_dir=None):
+    server = Flask(__name__)
+    store = FixtureStore(fixtures_dir) if fixtures_dir else None
+
+    @server.route("/v1/chat/completions", methods=["POST"])
+    def chat_completions():
+        delay = latency_ms + random.uniform(0, jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+        if error_rate and random.random() < error_rate:
+            return jsonify({"error": {"message": "fake upstream error", "type": "server_error"}}), 503
+
+        payload = request.get_json(force=True)
+        recorded = store.load(payload) if store else None
+        return jsonify(recorded if recorded is not None else fake_completion(payload))
+
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI Chat Completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Fixed delay per request.")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Extra random delay, 0..N ms.")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of requests answered with 503.")
+    parser.add_argument("--fixtures", default=None, help="Serve matching recorded fixtures from this directory.")
+    args = parser.parse_args()
+
+    server = create_fake_server(args.latency_ms, args.jitter_ms, args.error_rate, args.fixtures)
+    server.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
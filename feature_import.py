@@ -0,0 +1,184 @@
+"""Bulk feature import from CSV / xlsx.
+
+Input files are read in fixed-size chunks (``pd.read_csv(chunksize=...)`` /
+openpyxl read-only mode), so the parsed input is never held in memory all at
+once. The destination table is still loaded whole, and the new rows and the
+set of touched Feature IDs grow with the file. Rows are upserted by Feature
+ID; WSJF is recomputed and the Excel file written once, after the last batch.
+"""
+import math
+import os
+import zipfile
+
+import pandas as pd
+
+from wsjf_store import compute_wsjf, ensure_excel_with_features, write_excel
+
+FEATURE_TEXT_COLUMNS = [
+    "Feature ID",
+    "Feature Name",
+    "Feature Description",
+    "Feature Acceptance Criteria",
+]
+
+# derived on recompute; accepted (and ignored) so an export can be re-imported
+DERIVED_COLUMNS = ["Cost of Delay", "WSJF"]
+
+MAX_REPORTED_ERRORS = 1000
+
+
+def _blank(v) -> bool:
+    return v is None or (isinstance(v, float) and pd.isna(v)) or str(v).strip() == ""
+
+
+def validate_columns(columns, estimation_fields):
+    """Returns a list of problems with the header row (empty when valid)."""
+    problems = []
+    columns = [str(c).strip() for c in columns]
+    if "Feature ID" not in columns:
+        problems.append("Missing required column: Feature ID")
+    allowed = set(FEATURE_TEXT_COLUMNS) | set(estimation_fields) | set(DERIVED_COLUMNS)
+    unknown = [c for c in columns if c and c not in allowed]
+    if unknown:
+        problems.append(f"Unknown columns: {', '.join(unknown)}")
+    return problems
+
+
+def _numbered(rows, first):
+    """``(row_number, values)`` for each non-blank row, numbering from ``first``."""
+    for number, values in enumerate(rows, first):
+        if not all(_blank(v) for v in values):
+            yield number, values
+
+
+def _iter_csv(source, chunk_size):
+    # blank lines are kept (and skipped in _numbered) so row numbers match the file
+    reader = pd.read_csv(source, chunksize=chunk_size, dtype=str, keep_default_na=False, skip_blank_lines=False)
+    first = 2  # header is row 1
+    for chunk in reader:
+        yield [str(c).strip() for c in chunk.columns], _numbered(chunk.itertuples(index=False, name=None), first)
+        first += len(chunk)
+
+
+def _iter_xlsx(source, chunk_size):
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    try:
+        wb = load_workbook(source, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException) as e:
+        raise ValueError(f"Not a valid .xlsx file: {e}")
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [str(c).strip() if c is not None else "" for c in next(rows, ())]
+        batch = []
+        for row in _numbered(rows, 2):
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                yield header, batch
+                batch = []
+        if batch or not header:
+            yield header, batch
+    finally:
+        wb.close()
+
+
+def iter_chunks(source, filename: str, chunk_size: int):
+    """Yields ``(header, rows)`` per chunk; rows are ``(row_number, values)``
+    with values in header order and blank rows already skipped."""
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext == ".csv":
+        return _iter_csv(source, chunk_size)
+    if ext in (".xlsx", ".xlsm"):
+        return _iter_xlsx(source, chunk_size)
+    raise ValueError("Unsupported file type (expected .csv or .xlsx)")
+
+
+def _parse_row(header, values, estimation_fields):
+    """Returns (feature_id, {column: value}) or raises ValueError."""
+    raw = dict(zip(header, values))
+    feature_id = str(raw.get("Feature ID") or "").strip()
+    if not feature_id:
+        raise ValueError("Feature ID is required")
+
+    updates = {}
+    for col in FEATURE_TEXT_COLUMNS[1:]:
+        if col in raw and not _blank(raw[col]):
+            updates[col] = str(raw[col]).strip()
+    for col in estimation_fields:
+        if col not in raw or _blank(raw[col]):
+            continue
+        try:
+            num = float(str(raw[col]).strip())
+        except ValueError:
+            raise ValueError(f"{col} must be numeric (got {raw[col]!r})")
+        if num < 0 or not math.isfinite(num):
+            raise ValueError(f"{col} must be a finite, non-negative number")
+        updates[col] = num
+    return feature_id, updates
+
+
+def import_features(source, filename: str, estimation_fields, batch_size: int = 1000):
+    """Streams ``source`` into the feature table.
+
+    Returns ``(report, touched_feature_ids)``. Raises ValueError when the file
+    type or header row is invalid; row-level problems are reported per row and
+    do not abort the import.
+    """
+    batch_size = max(1, int(batch_size))
+    df = ensure_excel_with_features()
+    for col in FEATURE_TEXT_COLUMNS:
+        df[col] = df[col].astype(object) if col in df.columns else ""
+    for col in estimation_fields:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    df = df.reset_index(drop=True)
+    positions = {str(fid): i for i, fid in enumerate(df["Feature ID"].astype(str))}
+
+    report = {"rows": 0, "inserted": 0, "updated": 0, "failed": 0, "errors": [], "errors_truncated": False}
+    touched = set()
+    new_rows = {}  # inserts are collected and appended with a single concat
+    validated = False
+
+    for header, rows in iter_chunks(source, filename, batch_size):
+        if not validated:
+            problems = validate_columns(header, estimation_fields)
+            if problems:
+                raise ValueError("; ".join(problems))
+            validated = True
+
+        for row_number, values in rows:
+            report["rows"] += 1
+            try:
+                feature_id, updates = _parse_row(header, values, estimation_fields)
+            except ValueError as e:
+                report["failed"] += 1
+                if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                    raw_id = dict(zip(header, values)).get("Feature ID")
+                    report["errors"].append({
+                        "row": row_number,
+                        "feature_id": "" if _blank(raw_id) else str(raw_id).strip(),
+                        "error": str(e),
+                    })
+                else:
+                    report["errors_truncated"] = True
+                continue
+
+            touched.add(feature_id)
+            pos = positions.get(feature_id)
+            if pos is not None:
+                for col, val in updates.items():
+                    df.at[pos, col] = val
+                report["updated"] += 1
+            elif feature_id in new_rows:
+                new_rows[feature_id].update(updates)
+                report["updated"] += 1
+            else:
+                new_rows[feature_id] = {"Feature ID": feature_id, **updates}
+                report["inserted"] += 1
+
+    if new_rows:
+        df = pd.concat([df, pd.DataFrame(list(new_rows.values()))], ignore_index=True)
+
+    compute_wsjf(df)
+    write_excel(df, source="import")
+    return report, touched
@@ -0,0 +1,436 @@
+"""Versioned history of the feature table's estimation inputs.
+
+Every write of the Excel file (poker commit, import, WSJF page refresh) and
+every edit made to it outside the app is recorded as one compact line in
+``deltas.jsonl`` holding only the cells that changed. Every
+``HISTORY_SNAPSHOT_EVERY`` deltas the full state is saved to
+``snapshots/<seq>.json`` and indexed in ``snapshots.jsonl`` with the byte
+offset of the next delta, so reconstructing the table at any point reads one
+snapshot plus at most one snapshot interval of deltas, however long the
+history grows.
+
+PI labels (``labels.json``) pin a name such as ``PI-2026.3`` to a point in
+the history so two planning rounds can be compared by name.
+"""
+import bisect
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from flask import current_app
+
+TRACKED_COLUMNS = [
+    "Feature Name",
+    "Business Value",
+    "Time Complexity",
+    "OE/RR Value",
+    "Job Size",
+    "Story Points",
+]
+
+_TS_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+
+def _now() -> str:
+    return datetime.utcnow().strftime(_TS_FORMAT)
+
+
+def parse_ts(value: str) -> str:
+    """Normalizes an ISO date / datetime to the log's UTC timestamp format."""
+    dt = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.strftime(_TS_FORMAT)
+
+
+def _cell(col, v):
+    if v is None or (isinstance(v, float) and v != v) or str(v).strip() == "":
+        return None
+    if col == "Feature Name":
+        return str(v)
+    try:
+        num = float(v)
+    except (TypeError, ValueError):
+        return None
+    return None if num != num else num
+
+
+def table_state(df) -> dict:
+    """``{feature_id: {column: value}}`` for the tracked columns (blanks omitted)."""
+    cols = [c for c in TRACKED_COLUMNS if c in df.columns]
+    state = {}
+    for rec in df[["Feature ID", *cols]].to_dict(orient="records"):
+        fid = str(rec.pop("Feature ID", "") or "").strip()
+        if not fid or fid == "nan":
+            continue
+        row = {}
+        for col, v in rec.items():
+            v = _cell(col, v)
+            if v is not None:
+                row[col] = v
+        state[fid] = row
+    return state
+
+
+def diff_states(old: dict, new: dict):
+    """Returns ``(set, delete)``: changed cells per feature (None = cleared)
+    and the features that disappeared."""
+    changed = {}
+    for fid, row in new.items():
+        prev = old.get(fid)
+        if prev is None:
+            changed[fid] = dict(row)
+            continue
+        cells = {col: row.get(col) for col in set(prev) | set(row) if prev.get(col) != row.get(col)}
+        if cells:
+            changed[fid] = cells
+    deleted = [fid for fid in old if fid not in new]
+    return changed, deleted
+
+
+def _apply(state: dict, delta: dict):
+    for fid, cells in (delta.get("set") or {}).items():
+        row = state.setdefault(fid, {})
+        for col, v in cells.items():
+            if v is None:
+                row.pop(col, None)
+            else:
+                row[col] = v
+    for fid in delta.get("del") or []:
+        state.pop(fid, None)
+
+
+class _FileLock:
+    """Exclusive lock shared by every worker process using the same directory."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._f = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._f = open(self.path, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self._f.fileno(), fcntl.LOCK_EX)
+        else:
+            self._f.seek(0)
+            msvcrt.locking(self._f.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._f.fileno(), fcntl.LOCK_UN)
+            else:
+                self._f.seek(0)
+                msvcrt.locking(self._f.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._f.close()
+
+
+class WsjfHistory:
+    """One history directory, safe to share between worker processes.
+
+    Every operation runs under a file lock and first applies whatever other
+    processes appended since this one last looked, so sequence numbers,
+    snapshots and offsets stay consistent across workers.
+    """
+
+    def __init__(self, directory: str, snapshot_every: int = 100, recent_depth: int = 5):
+        self.directory = directory
+        self.snapshot_every = max(1, int(snapshot_every))
+        self.recent_depth = max(1, int(recent_depth))
+        self.deltas_path = os.path.join(directory, "deltas.jsonl")
+        self.index_path = os.path.join(directory, "snapshots.jsonl")
+        self.labels_path = os.path.join(directory, "labels.json")
+        self.lock_path = os.path.join(directory, "history.lock")
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._file_key = None  # Excel file version the head state matches
+
+    @contextmanager
+    def _locked(self):
+        # never nested: a second flock from this process would deadlock
+        with self._lock, _FileLock(self.lock_path):
+            self._catch_up()
+            yield
+
+    # ---------- loading ----------
+    def _catch_up(self):
+        """Loads on first use, then applies snapshots / deltas written since
+        (by this or any other process)."""
+        if not self._loaded:
+            self._snapshots, self._snapshot_seqs, self._snapshot_ts = [], [], []
+            self._index_end = 0
+            self._head, self._seq, self._ts, self._end = {}, 0, None, 0
+            self._recent = {}  # feature_id -> column -> last values, oldest first
+            self._loaded = True
+            self._read_index()
+            if self._snapshots:
+                last = self._snapshots[-1]
+                with open(os.path.join(self.directory, last["file"]), "r", encoding="utf-8") as f:
+                    snap = json.load(f)
+                self._head, self._recent = snap["state"], snap.get("recent", {})
+                self._seq, self._ts, self._end = last["seq"], last["ts"], last["offset"]
+        else:
+            self._read_index()
+
+        if not os.path.exists(self.deltas_path) or os.path.getsize(self.deltas_path) <= self._end:
+            return
+        with open(self.deltas_path, "rb") as f:
+            f.seek(self._end)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn write at the tail
+                self._apply_head(json.loads(line))
+                self._end += len(line)
+
+    def _apply_head(self, delta: dict):
+        """Advances the head state and the per-cell ring of recent values."""
+        _apply(self._head, delta)
+        for fid, cells in (delta.get("set") or {}).items():
+            row = self._recent.setdefault(fid, {})
+            for col, v in cells.items():
+                if v is not None:
+                    ring = row.setdefault(col, [])
+                    ring.append(v)
+                    del ring[:-self.recent_depth]
+        for fid in delta.get("del") or []:
+            self._recent.pop(fid, None)
+        self._seq, self._ts = delta["seq"], delta["ts"]
+
+    def _read_index(self):
+        if not os.path.exists(self.index_path) or os.path.getsize(self.index_path) <= self._index_end:
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_end)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                entry = json.loads(line)
+                self._snapshots.append(entry)
+                self._snapshot_seqs.append(entry["seq"])
+                self._snapshot_ts.append(entry["ts"])
+                self._index_end += len(line)
+
+    def _replay(self, snapshot, seq=None, ts=None):
+        """``(state, seq, ts)`` from ``snapshot`` forward, stopping after
+        ``seq`` / ``ts``."""
+        if snapshot is None:
+            state, cur_seq, cur_ts, offset = {}, 0, None, 0
+        else:
+            with open(os.path.join(self.directory, snapshot["file"]), "r", encoding="utf-8") as f:
+                state = json.load(f)["state"]
+            cur_seq, cur_ts, offset = snapshot["seq"], snapshot["ts"], snapshot["offset"]
+
+        if os.path.exists(self.deltas_path):
+            with open(self.deltas_path, "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    delta = json.loads(line)
+                    if (seq is not None and delta["seq"] > seq) or (ts is not None and delta["ts"] > ts):
+                        break
+                    _apply(state, delta)
+                    cur_seq, cur_ts = delta["seq"], delta["ts"]
+        return state, cur_seq, cur_ts
+
+    # ---------- recording ----------
+    def record(self, df, source: str, file_key=None):
+        """Appends the difference between the head state and ``df``.
+
+        Returns the new sequence number, or None when nothing tracked changed.
+        """
+        new_state = table_state(df)
+        with self._locked():
+            if file_key is not None:
+                self._file_key = file_key
+            changed, deleted = diff_states(self._head, new_state)
+            if not changed and not deleted:
+                return None
+
+            delta = {"seq": self._seq + 1, "ts": max(_now(), self._ts or ""), "source": source}
+            if changed:
+                delta["set"] = changed
+            if deleted:
+                delta["del"] = deleted
+            line = (json.dumps(delta, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+            with open(self.deltas_path, "ab") as f:
+                if f.tell() > self._end:
+                    f.truncate(self._end)  # drop a torn line left by a crashed writer
+                f.write(line)
+            self._apply_head(delta)
+            self._end += len(line)
+
+            last_snapshot = self._snapshot_seqs[-1] if self._snapshot_seqs else 0
+            if self._seq - last_snapshot >= self.snapshot_every:
+                self._write_snapshot()
+            return self._seq
+
+    def observe(self, df, file_key):
+        """Records edits made to the Excel file outside the app.
+
+        Cheap when the file is unchanged since the last read or write.
+        """
+        if file_key is not None and file_key == self._file_key:
+            return None
+        return self.record(df, "external", file_key=file_key)
+
+    def _write_snapshot(self):
+        os.makedirs(os.path.join(self.directory, "snapshots"), exist_ok=True)
+        name = os.path.join("snapshots", f"{self._seq:010d}.json")
+        path = os.path.join(self.directory, name)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"seq": self._seq, "ts": self._ts, "state": self._head, "recent": self._recent}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+        entry = {"seq": self._seq, "ts": self._ts, "offset": self._end, "file": name}
+        with open(self.index_path, "ab") as f:
+            if f.tell() > self._index_end:
+                f.truncate(self._index_end)
+            f.write((json.dumps(entry) + "\n").encode("utf-8"))
+        self._read_index()
+
+    # ---------- queries ----------
+    def state_at(self, seq=None, ts=None):
+        """``(state, seq, ts)`` as of sequence number ``seq`` or timestamp ``ts``
+        (both None = latest)."""
+        with self._locked():
+            at_head = (seq is None and ts is None) or (seq is not None and seq >= self._seq) \
+                or (ts is not None and self._ts is not None and ts >= self._ts)
+            if at_head:
+                return json.loads(json.dumps(self._head)), self._seq, self._ts
+
+            if seq is not None:
+                i = bisect.bisect_right(self._snapshot_seqs, seq)
+            else:
+                i = bisect.bisect_right(self._snapshot_ts, ts)
+            snapshot = self._snapshots[i - 1] if i else None
+            return self._replay(snapshot, seq=seq, ts=ts)
+
+    def field_values(self) -> dict:
+        """Last ``recent_depth`` values each tracked cell has held, oldest
+        first: ``{feature_id: {column: [values]}}``. Kept up to date as deltas
+        are applied, so the cost does not grow with the history."""
+        with self._locked():
+            return {fid: {col: list(ring) for col, ring in row.items()} for fid, row in self._recent.items()}
+
+    @property
+    def head_seq(self) -> int:
+        with self._locked():
+            return self._seq
+
+    # ---------- PI labels ----------
+    def labels(self) -> dict:
+        if not os.path.exists(self.labels_path):
+            return {}
+        with open(self.labels_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def add_label(self, name: str, ref=None) -> dict:
+        """Pins ``name`` to ``ref`` (timestamp or label, default: now)."""
+        seq = self.resolve(ref) if ref else self.head_seq
+        _, seq, ts = self.state_at(seq=seq)
+        with self._locked():
+            labels = self.labels()
+            labels[name] = {"seq": seq, "ts": ts, "created_at": _now()}
+            tmp = self.labels_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(labels, f, indent=2, ensure_ascii=False)
+            os.replace(tmp, self.labels_path)
+        return labels[name]
+
+    def resolve(self, ref: str) -> int:
+        """Sequence number for a PI label or an ISO timestamp.
+
+        Raises ValueError when ``ref`` is neither.
+        """
+        label = self.labels().get(ref)
+        if label is not None:
+            return label["seq"]
+        try:
+            ts = parse_ts(ref)
+        except ValueError:
+            raise ValueError(f"Unknown label or timestamp: {ref!r}")
+        return self.state_at(ts=ts)[1]
+
+
+def get_history(app=None) -> WsjfHistory:
+    app = app or current_app
+    history = app.extensions.get("wsjf_history")
+    if history is None:
+        history = app.extensions["wsjf_history"] = WsjfHistory(
+            app.config["HISTORY_DIR"],
+            app.config["HISTORY_SNAPSHOT_EVERY"],
+            app.config["SIMULATION_HISTORY_DEPTH"],
+        )
+    return history
+
+
+# ==================================================
+# RANKED TABLE AS OF A POINT IN HISTORY
+# ==================================================
+def rank_state(state: dict):
+    """Ranked WSJF records for a reconstructed state (same maths as the live table)."""
+    import pandas as pd
+    from wsjf_store import compute_wsjf
+
+    if not state:
+        return []
+    df = pd.DataFrame([{"Feature ID": fid, **row} for fid, row in state.items()])
+    for col in TRACKED_COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+    ranked = compute_wsjf(df)
+
+    out = []
+    for rank, rec in enumerate(ranked.to_dict(orient="records"), start=1):
+        item = {"rank": rank}
+        for col in ["Feature ID", *TRACKED_COLUMNS, "Cost of Delay", "WSJF"]:
+            v = rec.get(col)
+            item[col] = None if isinstance(v, float) and v != v else v
+        out.append(item)
+    return out
+
+
+def diff_rankings(old: list, new: list):
+    """Per-feature changes between two ranked tables (unchanged features omitted)."""
+    before = {r["Feature ID"]: r for r in old}
+    after = {r["Feature ID"]: r for r in new}
+    out = []
+    for fid in [*after, *(f for f in before if f not in after)]:
+        a, b = before.get(fid), after.get(fid)
+        if a is None:
+            status = "added"
+        elif b is None:
+            status = "removed"
+        else:
+            status = "changed"
+        changes = {
+            col: {"from": (a or {}).get(col), "to": (b or {}).get(col)}
+            for col in TRACKED_COLUMNS
+            if (a or {}).get(col) != (b or {}).get(col)
+        }
+        rank = {"from": a and a["rank"], "to": b and b["rank"]}
+        if status == "changed" and not changes and rank["from"] == rank["to"]:
+            continue
+        out.append({
+            "feature_id": fid,
+            "feature_name": (b or a).get("Feature Name"),
+            "status": status,
+            "changes": changes,
+            "rank": rank,
+            "wsjf": {"from": a and a["WSJF"], "to": b and b["WSJF"]},
+        })
+    return out
@@ -0,0 +1,245 @@
+"""Pluggable transport behind ``ai._openai_chat``.
+
+``LLM_MODE`` selects the backend:
+
+- ``live``    real HTTPS calls to ``OPENAI_BASE_URL`` (default).
+- ``record``  live calls; every request/response pair is also saved to
+              ``LLM_FIXTURES_DIR``, keyed by a hash of the normalized payload.
+- ``replay``  serves saved fixtures only, offline and instantly; a request
+              that was never recorded is an error.
+- ``fake``    canned, schema-valid answers generated in-process (CI / load
+              tests). ``fake_llm_server.py`` serves the same answers over HTTP
+              for pointing ``live`` mode at.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+
+from flask import current_app
+
+MODES = ("live", "record", "replay", "fake")
+
+
+def normalize_payload(payload: dict) -> str:
+    """Canonical JSON for a request: key order and incidental whitespace in
+    message text don't change the fixture key."""
+    messages = []
+    for m in payload.get("messages") or []:
+        content = str(m.get("content", "")).replace("\r\n", "\n")
+        content = "\n".join(line.rstrip() for line in content.strip().split("\n"))
+        messages.append({"role": m.get("role"), "content": content})
+    canonical = {k: v for k, v in payload.items() if k != "messages"}
+    canonical["messages"] = messages
+    return json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def payload_key(payload: dict) -> str:
+    return hashlib.sha256(normalize_payload(payload).encode("utf-8")).hexdigest()
+
+
+class FixtureStore:
+    """One JSON file per request: ``<dir>/<payload hash>.json``."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, payload: dict):
+        path = self._path(payload_key(payload))
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["response"]
+
+    def save(self, payload: dict, response: dict):
+        key = payload_key(payload)
+        path = self._path(key)
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"key": key, "request": payload, "response": response}, f, indent=2, ensure_ascii=False)
+            os.replace(tmp, path)
+
+
+# ==================================================
+# BACKENDS
+# Each returns (status, body): body is the decoded JSON on success, the
+# error text otherwise.
+# ==================================================
+class LiveBackend:
+    name = "live"
+
+    def __init__(self, api_key: str, base_url: str, timeout: float = 60):
+        self.api_key = api_key
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.timeout = timeout
+
+    def complete(self, payload: dict):
+        import requests
+
+        if not self.api_key:
+            raise RuntimeError("Missing OPENAI_API_KEY environment variable")
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+        r = requests.post(self.url, headers=headers, json=payload, timeout=self.timeout)
+        if r.status_code >= 400:
+            return r.status_code, r.text
+        return r.status_code, r.json()
+
+
+class RecordingBackend:
+    name = "record"
+
+    def __init__(self, inner, store: FixtureStore):
+        self.inner = inner
+        self.store = store
+
+    def complete(self, payload: dict):
+        status, body = self.inner.complete(payload)
+        if status < 400:
+            self.store.save(payload, body)
+        return status, body
+
+
+class ReplayBackend:
+    name = "replay"
+
+    def __init__(self, store: FixtureStore):
+        self.store = store
+
+    def complete(self, payload: dict):
+        response = self.store.load(payload)
+        if response is None:
+            raise RuntimeError(
+                f"No recorded LLM response for request {payload_key(payload)[:12]} "
+                "(run once with LLM_MODE=record)"
+            )
+        return 200, response
+
+
+class FakeBackend:
+    name = "fake"
+
+    def complete(self, payload: dict):
+        return 200, fake_completion(payload)
+
+
+def llm_configured(app=None) -> bool:
+    """True when AI calls can be attempted (offline modes need no API key)."""
+    app = app or current_app
+    return app.config.get("LLM_MODE", "live") in ("replay", "fake") or bool(app.config.get("OPENAI_API_KEY"))
+
+
+def get_backend(app=None):
+    app = app or current_app
+    backend = app.extensions.get("llm_backend")
+    if backend is not None:
+        return backend
+
+    mode = app.config.get("LLM_MODE", "live")
+    if mode not in MODES:
+        raise RuntimeError(f"Unknown LLM_MODE {mode!r} (expected one of {', '.join(MODES)})")
+
+    store = FixtureStore(app.config["LLM_FIXTURES_DIR"])
+    live = LiveBackend(app.config.get("OPENAI_API_KEY", ""), app.config["OPENAI_BASE_URL"])
+    if mode == "record":
+        backend = RecordingBackend(live, store)
+    elif mode == "replay":
+        backend = ReplayBackend(store)
+    elif mode == "fake":
+        backend = FakeBackend()
+    else:
+        backend = live
+    app.extensions["llm_backend"] = backend
+    return backend
+
+
+# ==================================================
+# FAKE COMPLETIONS (shared with fake_llm_server.py)
+# ==================================================
+def _fake_score(seed: str, lo: int = 2, hi: int = 5) -> int:
+    return lo + int(hashlib.md5(seed.encode("utf-8")).hexdigest(), 16) % (hi - lo + 1)
+
+
+def _fake_assessment(feature_id: str) -> dict:
+    dims = [
+        "Strategic Alignment",
+        "Clarity of Problem Statement",
+        "Quality of Acceptance Criteria",
+        "Testability & Measurability",
+        "Size Appropriateness",
+        "Risk Visibility",
+        "WSJF Input Justification",
+    ]
+    scores = [_fake_score(feature_id + d) for d in dims]
+    overall = round(sum(scores) / len(scores), 1)
+    levels = ["Weak", "Needs Refinement", "PI-Ready with Risks", "Strong", "Exemplary"]
+    return {
+        "dimension_scores": [
+            {
+                "dimension": d,
+                "score": s,
+                "reason": f"[fake] {d} assessed for {feature_id}.",
+                "improvement": f"[fake] Tighten {d.lower()}.",
+            }
+            for d, s in zip(dims, scores)
+        ],
+        "overall_score": overall,
+        "maturity_level": levels[min(4, max(0, round(overall) - 1))],
+        "top_3_improvements": ["[fake] Quantify the outcome", "[fake] Split oversized scope", "[fake] Name dependencies"],
+        "improved_feature_version": f"[fake] Improved version of {feature_id}.",
+    }
+
+
+def _fake_breakdown(feature_id: str, feature_name: str) -> dict:
+    return {
+        "feature_id": feature_id,
+        "feature_name": feature_name,
+        "stories": [
+            {
+                "story_id": f"USR-{i:03d}",
+                "title": f"[fake] {feature_name} slice {i}",
+                "user_story": f"As a user, I want {feature_name.lower()} slice {i}, so that value is delivered incrementally.",
+                "acceptance_criteria": [f"[fake] Criterion {i}.{n}" for n in range(1, 4)],
+                "type": "spike" if i == 1 else "story",
+                "dependencies": [f"USR-{i - 1:03d}"] if i > 1 else [],
+            }
+            for i in range(1, 6)
+        ],
+    }
+
+
+def fake_completion(payload: dict) -> dict:
+    """Schema-valid chat completion for the prompts this app sends."""
+    user = next((m.get("content", "") for m in reversed(payload.get("messages") or []) if m.get("role") == "user"), "")
+    ids = re.findall(r"^Feature ID: *(.+?) *$", user, flags=re.M)
+
+    if "Break down this Feature into user stories" in user:
+        name = (re.findall(r"^Feature Name: *(.+?) *$", user, flags=re.M) or ["Feature"])[0]
+        body = _fake_breakdown(ids[0] if ids else "", name)
+    elif "keyed by Feature ID" in user:
+        body = {"results": {fid: _fake_assessment(fid) for fid in ids}}
+    else:
+        body = _fake_assessment(ids[0] if ids else "")
+
+    content = json.dumps(body, ensure_ascii=False)
+    prompt_chars = sum(len(str(m.get("content", ""))) for m in payload.get("messages") or [])
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "model": payload.get("model", "fake"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_chars // 4 + 1,
+            "completion_tokens": len(content) // 4 + 1,
+            "total_tokens": prompt_chars // 4 + len(content) // 4 + 2,
+        },
+    }
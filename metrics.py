@@ -0,0 +1,256 @@
+"""Lightweight Prometheus-style metrics (no external dependencies).
+
+Counters, gauges and histograms are kept in-process and rendered in the
+Prometheus text exposition format on ``/metrics``. Recording a sample is a
+dict lookup plus a couple of additions under a lock, so instrumentation can
+stay on in production.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, before_render_template, g, request, template_rendered
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names, values, extra=None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def collect(self):
+        """Yields exposition lines (without HELP/TYPE header)."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.collect())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, v in items:
+            yield f"{self.name}{_label_str(self.labelnames, key)} {_fmt(v)}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._fn = None
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def set_function(self, fn):
+        """Evaluates ``fn()`` at scrape time instead of tracking a stored value."""
+        self._fn = fn
+
+    def collect(self):
+        if self._fn is not None:
+            try:
+                yield f"{self.name} {_fmt(self._fn())}"
+            except Exception:
+                pass
+            return
+        with self._lock:
+            items = list(self._values.items())
+        for key, v in items:
+            yield f"{self.name}{_label_str(self.labelnames, key)} {_fmt(v)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    counts[i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def collect(self):
+        with self._lock:
+            items = [(k, (list(s[0]), s[1], s[2])) for k, s in self._values.items()]
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for upper, c in zip(self.buckets, counts):
+                cumulative += c
+                labels = _label_str(self.labelnames, key, ("le", _fmt(upper)))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_label_str(self.labelnames, key)} {_fmt(total)}"
+            yield f"{self.name}_count{_label_str(self.labelnames, key)} {n}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# ==================================================
+# APP METRICS
+# ==================================================
+REQUEST_DURATION = Histogram(
+    "pi_http_request_duration_seconds",
+    "Flask request duration by endpoint.",
+    ["method", "endpoint", "status"],
+)
+STORAGE_DURATION = Histogram(
+    "pi_storage_duration_seconds",
+    "Time spent in storage I/O (Excel / JSON).",
+    ["op"],
+)
+TEMPLATE_DURATION = Histogram(
+    "pi_template_render_seconds",
+    "Jinja template rendering time.",
+    ["template"],
+)
+WSJF_DURATION = Histogram(
+    "pi_wsjf_compute_seconds",
+    "Time spent computing Cost of Delay / WSJF over the feature table.",
+)
+OPENAI_DURATION = Histogram(
+    "pi_openai_request_duration_seconds",
+    "OpenAI chat completion latency.",
+    ["status"],
+    buckets=(0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0),
+)
+OPENAI_TOKENS = Counter(
+    "pi_openai_tokens_total",
+    "Tokens reported by OpenAI usage.",
+    ["kind"],
+)
+AI_QUALITY_ASSESSMENTS = Counter(
+    "pi_ai_quality_assessments_total",
+    "Feature quality assessments produced, by mode (single/packed).",
+    ["mode"],
+)
+CACHE_REQUESTS = Counter(
+    "pi_cache_requests_total",
+    "Cache lookups by cache and result (hit/miss).",
+    ["cache", "result"],
+)
+POKER_SESSIONS_ACTIVE = Gauge(
+    "pi_poker_sessions_active",
+    "Planning poker sessions held in memory.",
+)
+POKER_USERS_ACTIVE = Gauge(
+    "pi_poker_users_active",
+    "Users joined across all planning poker sessions.",
+)
+
+
+def init_app(app):
+    """Registers per-request timing hooks and the /metrics endpoint."""
+
+    @app.before_request
+    def _metrics_start():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _metrics_stop(response):
+        start = g.pop("_metrics_start", None)
+        if start is None:
+            return response
+        labels = {
+            "method": request.method,
+            "endpoint": request.endpoint or "unmatched",
+            "status": response.status_code,
+        }
+
+        def observe():
+            REQUEST_DURATION.observe(time.perf_counter() - start, **labels)
+
+        if response.is_streamed:
+            # the real work happens while the body is generated
+            response.call_on_close(observe)
+        else:
+            observe()
+        return response
+
+    def _template_start(sender, template, context, **extra):
+        g._metrics_template_start = time.perf_counter()
+
+    def _template_stop(sender, template, context, **extra):
+        start = g.pop("_metrics_template_start", None)
+        if start is not None:
+            TEMPLATE_DURATION.observe(time.perf_counter() - start, template=template.name)
+
+    before_render_template.connect(_template_start, app, weak=False)
+    template_rendered.connect(_template_stop, app, weak=False)
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
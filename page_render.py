@@ -0,0 +1,142 @@
+"""Streamed page rendering and per-row fragment caching.
+
+Large pages (one card per feature) are streamed: everything the template
+emits before the feature data is needed goes out immediately, the rest is
+sent in ~16 KB chunks. Each feature card is rendered from a partial and
+cached under the row's data version, so unchanged rows are never re-rendered.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from flask import current_app, stream_template
+from markupsafe import Markup
+
+import metrics
+
+STREAM_CHUNK_BYTES = 16 * 1024
+
+
+def row_version(record: dict) -> str:
+    """Content hash of a row; changes whenever any of its values change."""
+    raw = json.dumps(record, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=12).hexdigest()
+
+
+class FragmentCache:
+    """Bounded LRU of rendered HTML fragments."""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            html = self._items.get(key)
+            if html is not None:
+                self._items.move_to_end(key)
+            return html
+
+    def set(self, key, html):
+        with self._lock:
+            self._items[key] = html
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+FRAGMENTS = FragmentCache()
+
+
+def render_fragment(template_name: str, record: dict) -> Markup:
+    """Renders ``template_name`` with ``f=record``, cached on the row version."""
+    key = (template_name, str(record.get("Feature ID", "")), row_version(record))
+    html = FRAGMENTS.get(key)
+    if html is not None:
+        metrics.CACHE_REQUESTS.inc(cache="row_fragment", result="hit")
+        return html
+    metrics.CACHE_REQUESTS.inc(cache="row_fragment", result="miss")
+
+    html = Markup(current_app.jinja_env.get_template(template_name).render(f=record))
+    FRAGMENTS.set(key, html)
+    return html
+
+
+class LazyRows:
+    """Iterable over the first ``limit`` rows, loaded on first iteration.
+
+    Handing this to a streamed template defers the (slow) data load until the
+    template reaches its row loop, after the page header has been sent.
+    """
+
+    def __init__(self, loader, limit=None):
+        self._loader = loader
+        self.limit = limit
+        self._rows = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._rows is not None
+
+    def _all(self):
+        if self._rows is None:
+            self._rows = self._loader()
+        return self._rows
+
+    def __iter__(self):
+        rows = self._all()
+        return iter(rows if self.limit is None else rows[:self.limit])
+
+    @property
+    def total(self) -> int:
+        return len(self._all())
+
+    @property
+    def next_offset(self):
+        """Offset of the first row not rendered inline, or None if all were."""
+        if self.limit is None or self.limit >= self.total:
+            return None
+        return self.limit
+
+
+# appended when the page fails after the 200 and header are already sent
+STREAM_ERROR_HTML = (
+    '<div role="alert" style="margin:20px 0; padding:16px 18px; border:1px solid #7f1d1d; '
+    'border-radius:14px; background:#1f0a0a; color:#fecaca;">'
+    "Failed to load the feature list. Reload the page; if this persists, check the server log."
+    "</div></body></html>"
+)
+
+
+def stream_page(template_name: str, rows: LazyRows, **context):
+    """Streams a template, flushing eagerly until ``rows`` has been loaded.
+
+    The status line has gone out before the rows load, so a failure there
+    is logged and ends the page with a visible error block instead.
+    """
+    # created here, not inside the generator, so it binds the request context
+    chunks = stream_template(template_name, **context)
+    app = current_app._get_current_object()
+
+    def generate():
+        buf, size = [], 0
+        try:
+            for chunk in chunks:
+                buf.append(chunk)
+                size += len(chunk)
+                if not rows.loaded or size >= STREAM_CHUNK_BYTES:
+                    yield "".join(buf)
+                    buf, size = [], 0
+        except Exception:
+            app.logger.exception("Streaming %s failed", template_name)
+            buf.append(STREAM_ERROR_HTML)
+        if buf:
+            yield "".join(buf)
+
+    return generate()
@@ -0,0 +1,196 @@
+"""Opt-in, per-request profiling captures.
+
+Disabled unless ``PROFILING_ENABLED`` is set and a ``PROFILING_TOKEN`` is
+configured. A request is profiled when it carries the token either in the
+``X-Profile-Token`` header or the ``?profile=<token>`` query parameter. The
+request runs under ``cProfile`` and the stats are written as a ``.prof``
+(pstats) file to ``PROFILING_DIR``; only the newest ``PROFILING_KEEP`` files
+are kept.
+
+Work outside a request (AI calls, background jobs) can be wrapped with the
+``profiled(label)`` decorator; it captures only when ``PROFILING_TASKS`` is
+also enabled.
+
+Inspect a capture with ``python -m pstats <file>`` or snakeviz.
+"""
+import cProfile
+import functools
+import hmac
+import os
+import re
+import threading
+from datetime import datetime
+
+from flask import abort, current_app, g, has_app_context, jsonify, request, send_file
+
+HEADER = "X-Profile-Token"
+QUERY_PARAM = "profile"
+
+_local = threading.local()
+
+
+class Capture:
+    """A single cProfile run written to the capture directory on stop()."""
+
+    def __init__(self, profiler: "Profiler", label: str):
+        self.profiler = profiler
+        self.label = label
+        self.filename = None
+        self._prof = cProfile.Profile()
+        self._running = False
+
+    def start(self):
+        _local.active = True
+        self._running = True
+        self._prof.enable()
+        return self
+
+    def stop(self):
+        if not self._running:
+            return self.filename
+        self._prof.disable()
+        self._running = False
+        _local.active = False
+        self.filename = self.profiler.save(self._prof, self.label)
+        return self.filename
+
+
+class Profiler:
+    def __init__(self, directory: str, keep: int = 20):
+        self.directory = directory
+        self.keep = max(1, int(keep))
+        self._lock = threading.Lock()
+
+    def capture(self, label: str) -> Capture:
+        return Capture(self, label)
+
+    def save(self, prof: cProfile.Profile, label: str) -> str:
+        safe_label = re.sub(r"[^A-Za-z0-9_.-]+", "_", label).strip("_")[:60] or "capture"
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+        name = f"{stamp}_{safe_label}.prof"
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            prof.dump_stats(os.path.join(self.directory, name))
+            self._rotate()
+        return name
+
+    def _rotate(self):
+        files = sorted(f for f in os.listdir(self.directory) if f.endswith(".prof"))
+        for old in files[:-self.keep]:
+            try:
+                os.remove(os.path.join(self.directory, old))
+            except OSError:
+                pass
+
+    def list_captures(self):
+        if not os.path.isdir(self.directory):
+            return []
+        out = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if not name.endswith(".prof"):
+                continue
+            path = os.path.join(self.directory, name)
+            stamp, _, label = name[:-len(".prof")].partition("_")
+            out.append({
+                "name": name,
+                "label": label,
+                "captured_at": stamp,
+                "bytes": os.path.getsize(path),
+            })
+        return out
+
+
+def _enabled(app) -> bool:
+    return bool(app.config.get("PROFILING_ENABLED") and app.config.get("PROFILING_TOKEN"))
+
+
+def _get_profiler(app) -> Profiler:
+    profiler = app.extensions.get("profiler")
+    if profiler is None:
+        profiler = app.extensions["profiler"] = Profiler(
+            app.config["PROFILING_DIR"], app.config["PROFILING_KEEP"]
+        )
+    return profiler
+
+
+def _is_admin() -> bool:
+    token = request.headers.get(HEADER) or request.args.get(QUERY_PARAM) or ""
+    expected = current_app.config.get("PROFILING_TOKEN") or ""
+    return bool(expected) and hmac.compare_digest(token, expected)
+
+
+def profiled(label: str):
+    """Decorator: profiles the call when PROFILING_TASKS is on.
+
+    Skipped when a capture is already running on this thread (e.g. the call
+    happens inside a profiled request) so captures never nest.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if (
+                getattr(_local, "active", False)
+                or not has_app_context()
+                or not _enabled(current_app)
+                or not current_app.config.get("PROFILING_TASKS")
+            ):
+                return fn(*args, **kwargs)
+            capture = _get_profiler(current_app).capture(f"task-{label}").start()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                capture.stop()
+
+        return wrapper
+
+    return decorator
+
+
+def init_app(app):
+    app.config.setdefault("PROFILING_ENABLED", False)
+    app.config.setdefault("PROFILING_TOKEN", "")
+    app.config.setdefault("PROFILING_TASKS", False)
+    app.config.setdefault("PROFILING_DIR", os.path.join(app.root_path, "data", "profiles"))
+    app.config.setdefault("PROFILING_KEEP", 20)
+
+    @app.before_request
+    def _profile_start():
+        if not _enabled(app) or getattr(_local, "active", False):
+            return
+        if (request.endpoint or "").startswith("admin_profile") or not _is_admin():
+            return
+        label = f"{request.method}-{request.endpoint or 'unmatched'}"
+        g._profile_capture = _get_profiler(app).capture(label).start()
+
+    @app.after_request
+    def _profile_attach(response):
+        capture = g.pop("_profile_capture", None)
+        if capture is not None:
+            if response.is_streamed:
+                # keep profiling until the body has been fully generated
+                response.call_on_close(capture.stop)
+            else:
+                response.headers["X-Profile-Capture"] = capture.stop()
+        return response
+
+    @app.teardown_request
+    def _profile_abort(exc):
+        capture = g.pop("_profile_capture", None)
+        if capture is not None:
+            capture.stop()
+
+    @app.route("/admin/profiles")
+    def admin_profiles():
+        if not _enabled(app) or not _is_admin():
+            abort(404)
+        return jsonify({"captures": _get_profiler(app).list_captures()})
+
+    @app.route("/admin/profiles/<name>")
+    def admin_profile_download(name):
+        if not _enabled(app) or not _is_admin():
+            abort(404)
+        profiler = _get_profiler(app)
+        if name not in {c["name"] for c in profiler.list_captures()}:
+            abort(404)
+        return send_file(os.path.join(profiler.directory, name), as_attachment=True)
@@ -0,0 +1,289 @@
+"""Monte Carlo rank stability for the WSJF backlog.
+
+``api_reveal`` collapses each field's votes to ``nearest_fibo(avg)``. Here
+every estimation field of every feature is instead a small multiset of
+plausible values: the individual poker votes when a session has them, else
+the values the field has held across recent history, else the committed
+value alone. Each trial draws one value per feature and field, recomputes
+Cost of Delay / WSJF exactly as ``compute_wsjf`` does and ranks the backlog.
+
+All trials of a chunk are one set of NumPy array operations (no per-trial
+Python), and only features with spread in their inputs are drawn and sorted
+per trial. On one core, 10k trials over 3000 features of which a fifth are
+uncertain take about a second; cost grows with the uncertain count
+(roughly 3 s when all 3000 are) and about doubles with ``capacity_sp``.
+Responses carry mean and p5/p50/p95 ranks; the rank histogram is opt-in.
+"""
+import time
+
+import numpy as np
+
+WSJF_FIELDS = ["Business Value", "Time Complexity", "OE/RR Value", "Job Size"]
+SAMPLED_FIELDS = WSJF_FIELDS + ["Story Points"]
+
+# trials per chunk are sized so each (trials x features) array stays ~2M cells
+CHUNK_CELLS = 2_000_000
+
+# rank histograms keep at most this many columns per feature: exact for
+# backlogs up to this size, ceil(n / RANK_BUCKETS) ranks per column above it
+RANK_BUCKETS = 1000
+
+
+def _num(v):
+    try:
+        v = float(v)
+    except (TypeError, ValueError):
+        return np.nan
+    return v
+
+
+def build_distributions(records, sessions: dict, history_values: dict):
+    """One entry per ranked record with the sample multiset of each field.
+
+    ``sessions`` is ``POKER_SESSIONS``; ``history_values`` maps
+    ``{feature_id: {field: [values, oldest first]}}``.
+    """
+    # sessions and their votes change under /start_poker and /api/vote on
+    # other threads; snapshot them before iterating
+    votes_by_feature = {}
+    for s in list(sessions.values()):
+        votes_by_feature[str(s.get("feature_id"))] = dict(s.get("votes") or {})
+
+    out = []
+    for r in records:
+        fid = str(r.get("Feature ID", ""))
+        votes = votes_by_feature.get(fid, {})
+        past = history_values.get(fid, {})
+        samples, sources = {}, {}
+        for field in SAMPLED_FIELDS:
+            field_votes = list(dict(votes.get(field) or {}).values())
+            if field_votes:
+                samples[field], sources[field] = [_num(v) for v in field_votes], "votes"
+            elif len(set(past.get(field) or [])) > 1:
+                samples[field], sources[field] = [_num(v) for v in past[field]], "history"
+            else:
+                samples[field], sources[field] = [_num(r.get(field))], "current"
+        out.append({
+            "feature_id": fid,
+            "feature_name": str(r.get("Feature Name", "")),
+            "wsjf": _num(r.get("WSJF")),
+            "samples": samples,
+            "sources": sources,
+        })
+    return out
+
+
+def _support(features, field):
+    """``(values, counts)``: per-feature sample values padded to a rectangle.
+
+    Blanks become 0, as ``compute_wsjf``'s ``fillna(0)`` / ``Job Size > 0``
+    treat them.
+    """
+    counts = np.array([len(f["samples"][field]) for f in features], dtype=np.uint32)
+    values = np.zeros((len(features), int(counts.max())))
+    for i, f in enumerate(features):
+        values[i, :counts[i]] = f["samples"][field]
+    return np.nan_to_num(values, copy=False), counts
+
+
+def _draw(rng, support, n_trials):
+    """``(n_trials, features)`` values, each drawn uniformly from its multiset."""
+    values, counts = support
+    if (counts == 1).all():
+        return np.broadcast_to(values[:, 0], (n_trials, len(counts)))
+    # 16 random bits scaled by multiply-shift: cheaper than float draws, and
+    # the bias (< counts / 65536) is far below Monte Carlo noise
+    bits = rng.integers(0, 1 << 16, size=(n_trials, len(counts)), dtype=np.uint16)
+    idx = (bits * counts) >> 16
+    rows = np.arange(len(counts), dtype=np.int64) * values.shape[1]
+    return np.take(values.ravel(), idx + rows)
+
+
+def _cents(draws):
+    """WSJF in whole cents, i.e. compute_wsjf's round(CoD / Job Size, 2) * 100."""
+    cod = draws["Business Value"] + draws["Time Complexity"]
+    cod = cod + draws["OE/RR Value"]
+    job = draws["Job Size"]
+    ratio = np.zeros(np.broadcast(cod, job).shape)
+    np.divide(cod, job, out=ratio, where=job > 0)
+    return np.rint(ratio * 100, out=ratio)
+
+
+def _capacity_cut(rng, sp_support, capacity_sp, unc, fixed, order, ahead_fixed, n):
+    """Per-feature count of trials in which the feature fits, in WSJF order,
+    into ``capacity_sp`` sampled story points (needs the full order)."""
+    t, n_unc = order.shape
+    n_fixed = len(fixed)
+    rows = np.arange(t)[:, None]
+    full = np.empty((t, n), dtype=np.int64)  # full[trial, rank] = feature
+    full[rows, ahead_fixed + np.arange(n_unc)] = unc[order]
+    if n_fixed:
+        ahead_unc = np.bincount((rows * (n_fixed + 1) + ahead_fixed).ravel(), minlength=t * (n_fixed + 1))
+        ahead_unc = ahead_unc.reshape(t, n_fixed + 1).cumsum(axis=1)[:, :n_fixed]
+        full[rows, np.arange(n_fixed) + ahead_unc] = fixed
+    sp = np.take_along_axis(_draw(rng, sp_support, t), full, axis=1)
+    fits = np.cumsum(sp, axis=1) <= capacity_sp
+    return np.bincount(full[fits], minlength=n)
+
+
+def simulate_rankings(features, trials: int = 10000, cut=None, capacity_sp=None, seed=None, distribution=False):
+    """Rank statistics of every feature over ``trials`` sampled backlogs.
+
+    The cut line is either the top ``cut`` features or, with
+    ``capacity_sp``, the features that fit (in WSJF order) into that many
+    sampled story points. ``distribution`` adds each feature's sparse rank
+    histogram, keyed by the first rank of each histogram column.
+
+    Features whose WSJF inputs are all single values ("fixed") are ranked
+    among themselves once. Per trial only the uncertain features are drawn
+    and sorted; a fixed feature's rank is its fixed slot plus the number of
+    uncertain features ahead of it, which is tallied for all fixed slots at
+    once with a difference array, so the per-trial cost grows with the
+    uncertain features rather than the backlog.
+    """
+    started = time.perf_counter()
+    n = len(features)
+    if n == 0:
+        return {"trials": 0, "rank_resolution": 1, "features": []}
+
+    rng = np.random.default_rng(seed)
+    supports = {field: _support(features, field) for field in SAMPLED_FIELDS}
+
+    width = -(-n // RANK_BUCKETS)
+    buckets = -(-n // width)
+    positions = np.arange(n)
+
+    spread = np.zeros(n, dtype=bool)
+    for field in WSJF_FIELDS:
+        spread |= supports[field][1] > 1
+    unc = np.flatnonzero(spread)
+    n_unc = len(unc)
+    unc_supports = {field: (supports[field][0][unc], supports[field][1][unc]) for field in WSJF_FIELDS}
+
+    # (cents, position) is a unique integer key, ascending = better rank, so
+    # ties keep the current ranking's order without a (slower) stable sort
+    fixed = np.flatnonzero(~spread)
+    n_fixed = len(fixed)
+    fixed_cents = _cents({field: supports[field][0][fixed, 0] for field in WSJF_FIELDS})
+    fixed_keys = fixed_cents.astype(np.int64) * -n + fixed
+    by_key = np.argsort(fixed_keys)
+    fixed = fixed[by_key]  # fixed features by slot, best first
+    fixed_cents, fixed_keys = fixed_cents[by_key], fixed_keys[by_key]
+
+    unc_hist = np.zeros(n_unc * buckets, dtype=np.int64)
+    unc_rank_sum = np.zeros(n_unc)
+    # passed_diff[slot, m]: +1 where a run of fixed slots with m uncertain
+    # features ahead starts, -1 where it ends
+    passed_diff = np.zeros((n_fixed + 1) * (n_unc + 1), dtype=np.int64)
+    above_cut = np.zeros(n, dtype=np.int64)
+    cents_sum = np.zeros(n)
+    cents_sq = np.zeros(n)
+    cents_sum[fixed] = fixed_cents * trials
+    cents_sq[fixed] = fixed_cents ** 2 * trials
+
+    # the capacity cut materialises the full (trials x backlog) order
+    chunk = max(1, CHUNK_CELLS // (n if capacity_sp is not None else max(n_unc, 1)))
+    done = 0
+    while done < trials:
+        t = min(chunk, trials - done)
+
+        if not n_unc:
+            # nothing uncertain: every trial ranks the backlog identically
+            passed_diff[0] += t
+            passed_diff[n_fixed] -= t
+            if capacity_sp is not None:
+                order = ahead_fixed = np.zeros((t, 0), dtype=np.int64)
+                above_cut += _capacity_cut(rng, supports["Story Points"], capacity_sp, unc, fixed, order, ahead_fixed, n)
+            done += t
+            continue
+
+        cents = _cents({field: _draw(rng, unc_supports[field], t) for field in WSJF_FIELDS})
+        cents_sum[unc] += cents.sum(axis=0)
+        cents_sq[unc] += np.einsum("ij,ij->j", cents, cents)
+        keys = cents.astype(np.int64)
+        keys *= -n
+        keys += unc
+
+        # order[trial, k] = k-th best uncertain feature; searching with each
+        # row already sorted lets searchsorted reuse its bounds
+        order = np.argsort(keys, axis=1)
+        if n_fixed:
+            ahead_fixed = np.searchsorted(fixed_keys, np.take_along_axis(keys, order, axis=1))
+            unc_ranks = ahead_fixed + np.arange(n_unc)
+
+            # fixed slots [ahead_fixed[k-1], ahead_fixed[k]) have k uncertain ahead
+            starts = np.concatenate([np.zeros((t, 1), dtype=np.int64), ahead_fixed], axis=1)
+            ends = np.concatenate([ahead_fixed, np.full((t, 1), n_fixed)], axis=1)
+            m = np.arange(n_unc + 1)
+            passed_diff += np.bincount((starts * (n_unc + 1) + m).ravel(), minlength=passed_diff.size)
+            passed_diff -= np.bincount((ends * (n_unc + 1) + m).ravel(), minlength=passed_diff.size)
+        else:
+            ahead_fixed = np.zeros((t, n_unc), dtype=np.int64)
+            unc_ranks = np.broadcast_to(np.arange(n_unc), (t, n_unc))
+
+        bins = order * buckets
+        bins += unc_ranks if width == 1 else unc_ranks // width
+        unc_hist += np.bincount(bins.ravel(), minlength=n_unc * buckets)
+        unc_rank_sum += np.bincount(order.ravel(), weights=unc_ranks.ravel(), minlength=n_unc)
+
+        if capacity_sp is not None:
+            above_cut += _capacity_cut(rng, supports["Story Points"], capacity_sp, unc, fixed, order, ahead_fixed, n)
+        elif cut is not None:
+            inside = unc_ranks < cut
+            above_cut[unc] += np.bincount(order[inside], minlength=n_unc)
+        done += t
+
+    # passed[slot, m] = trials in which fixed slot had m uncertain features ahead
+    passed = passed_diff.reshape(n_fixed + 1, n_unc + 1).cumsum(axis=0)[:n_fixed]
+    slot, m = np.indices(passed.shape)
+    fixed_ranks = slot + m
+    fixed_hist = np.bincount(
+        (slot * buckets + fixed_ranks // width).ravel(), weights=passed.ravel(), minlength=n_fixed * buckets
+    )
+
+    hist = np.zeros((n, buckets), dtype=np.int64)
+    hist[unc] = unc_hist.reshape(n_unc, buckets)
+    hist[fixed] = fixed_hist.reshape(n_fixed, buckets).astype(np.int64)
+    rank_sum = np.zeros(n)
+    rank_sum[unc] = unc_rank_sum
+    rank_sum[fixed] = (passed * fixed_ranks).sum(axis=1)
+    if cut is not None and capacity_sp is None:
+        above_cut[fixed] = (passed * (fixed_ranks < cut)).sum(axis=1)
+
+    cdf = np.cumsum(hist, axis=1)
+    # 1-based rank at which each feature's CDF first reaches the percentile
+    # (the last rank of that histogram column when width > 1)
+    pcts = {
+        name: np.minimum(((cdf < q * trials - 1e-9).sum(axis=1) + 1) * width, n).tolist()
+        for name, q in (("p5", 0.05), ("p50", 0.5), ("p95", 0.95))
+    }
+    mean_rank = np.round(rank_sum / trials + 1, 2).tolist()
+    wsjf_mean = np.round(cents_sum / trials / 100, 3).tolist()
+    wsjf_std = np.round(np.sqrt(np.maximum(cents_sq / trials - (cents_sum / trials) ** 2, 0)) / 100, 3).tolist()
+    p_above = np.round(above_cut / trials, 4).tolist()
+
+    out = []
+    for i, f in enumerate(features):
+        item = {
+            "feature_id": f["feature_id"],
+            "feature_name": f["feature_name"],
+            "current_rank": i + 1,
+            "wsjf": None if np.isnan(f["wsjf"]) else f["wsjf"],
+            "wsjf_mean": wsjf_mean[i],
+            "wsjf_std": wsjf_std[i],
+            "rank": {"mean": mean_rank[i], "p5": pcts["p5"][i], "p50": pcts["p50"][i], "p95": pcts["p95"][i]},
+            "sources": f["sources"],
+        }
+        if cut is not None or capacity_sp is not None:
+            item["p_above_cut"] = p_above[i]
+        if distribution:
+            nz = np.flatnonzero(hist[i])
+            item["rank_distribution"] = dict(zip((nz * width + 1).tolist(), np.round(hist[i, nz] / trials, 4).tolist()))
+        out.append(item)
+
+    return {
+        "trials": trials,
+        "rank_resolution": width,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "features": out,
+    }
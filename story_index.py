@@ -0,0 +1,229 @@
+"""Near-duplicate detection for accepted user stories.
+
+Each story (title + user story + acceptance criteria) becomes a hashed
+TF-IDF vector: unigrams and bigrams are hashed into ``dims`` buckets with a
+sub-linear term frequency. Rows are kept L2-normalized in one dense float32
+matrix, so scoring a batch of incoming stories is a single matrix product.
+
+Adds and removes are incremental, and ``sync`` re-indexes only the features
+whose version (``accepted_at``) differs from the one indexed, so writes by
+other workers cost one feature each rather than a rebuild. IDF weights are
+frozen and refreshed only when the corpus has grown or shrunk by ~25% since
+the last refresh; the refresh re-weights every row from its sparse term
+counts in one vectorized pass.
+"""
+import math
+import re
+import threading
+import zlib
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have i in is it its of on or so that the
+this to we was were will with want wants as a user all can should must
+""".split())
+
+
+def story_text(story: dict) -> str:
+    ac = story.get("acceptance_criteria") or []
+    if not isinstance(ac, list):
+        ac = [ac]
+    return " ".join([str(story.get("title") or ""), str(story.get("user_story") or ""), *map(str, ac)])
+
+
+def feature_version(block) -> tuple:
+    """Version of a stored feature block: changes on every accept."""
+    block = block or {}
+    return (str(block.get("accepted_at") or ""), len(block.get("stories") or []))
+
+
+def tokenize(text: str):
+    words = [w for w in _TOKEN_RE.findall(text.lower()) if w not in STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class StoryIndex:
+    def __init__(self, dims: int = 512, refresh_ratio: float = 1.25):
+        self.dims = dims
+        self.refresh_ratio = refresh_ratio
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        dims = self.dims
+        self._matrix = np.zeros((0, dims), dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._meta = []         # row -> {"feature_id", "story_id", "title"}
+        self._sparse = []       # row -> (bucket indices, sub-linear tf) or None
+        self._free = []
+        self._rows_by_feature = {}
+        self._versions = {}     # feature_id -> version of its indexed stories
+        self._df = np.zeros(dims, dtype=np.int64)
+        self._n = 0
+        self._idf = np.ones(dims, dtype=np.float32)
+        self._idf_n = 0
+
+    def __len__(self):
+        return self._n
+
+    # ---------- vectors ----------
+    def _sparse_vector(self, text: str):
+        counts = {}
+        for tok in tokenize(text):
+            b = zlib.crc32(tok.encode("utf-8")) % self.dims
+            counts[b] = counts.get(b, 0) + 1
+        idx = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        tf = np.fromiter((1.0 + math.log(c) for c in counts.values()), dtype=np.float32, count=len(counts))
+        return idx, tf
+
+    def _dense(self, idx, tf):
+        v = np.zeros(self.dims, dtype=np.float32)
+        v[idx] = tf * self._idf[idx]
+        norm = np.linalg.norm(v)
+        return v / norm if norm > 0 else v
+
+    def _maybe_refresh_idf(self):
+        lo, hi = self._idf_n / self.refresh_ratio, self._idf_n * self.refresh_ratio
+        if self._idf_n and lo <= self._n <= hi:
+            return
+        self._idf = (np.log((1.0 + self._n) / (1.0 + self._df)) + 1.0).astype(np.float32)
+        self._idf_n = max(self._n, 1)
+
+        rows = [r for r, sp in enumerate(self._sparse) if sp is not None]
+        self._matrix[:] = 0
+        if not rows:
+            return
+        row_ids = np.concatenate([np.full(len(self._sparse[r][0]), r) for r in rows])
+        cols = np.concatenate([self._sparse[r][0] for r in rows])
+        vals = np.concatenate([self._sparse[r][1] for r in rows])
+        self._matrix[row_ids, cols] = vals * self._idf[cols]
+        norms = np.linalg.norm(self._matrix[:len(self._sparse)], axis=1, keepdims=True)
+        np.divide(self._matrix[:len(self._sparse)], norms, out=self._matrix[:len(self._sparse)], where=norms > 0)
+
+    def _alloc_row(self) -> int:
+        if self._free:
+            return self._free.pop()
+        row = len(self._sparse)
+        if row >= self._matrix.shape[0]:
+            cap = max(64, self._matrix.shape[0] * 2)
+            grown = np.zeros((cap, self.dims), dtype=np.float32)
+            grown[:row] = self._matrix[:row]
+            self._matrix = grown
+            alive = np.zeros(cap, dtype=bool)
+            alive[:row] = self._alive[:row]
+            self._alive = alive
+        self._sparse.append(None)
+        self._meta.append(None)
+        return row
+
+    # ---------- updates ----------
+    def _add(self, feature_id: str, story: dict, dense: bool = True):
+        idx, tf = self._sparse_vector(story_text(story))
+        row = self._alloc_row()
+        self._sparse[row] = (idx, tf)
+        self._meta[row] = {
+            "feature_id": feature_id,
+            "story_id": str(story.get("story_id") or ""),
+            "title": str(story.get("title") or ""),
+        }
+        self._alive[row] = True
+        self._df[idx] += 1
+        self._n += 1
+        self._rows_by_feature.setdefault(feature_id, []).append(row)
+        if dense:
+            self._matrix[row] = self._dense(idx, tf)
+
+    def _remove_feature(self, feature_id: str):
+        self._versions.pop(feature_id, None)
+        for row in self._rows_by_feature.pop(feature_id, []):
+            idx, _ = self._sparse[row]
+            self._df[idx] -= 1
+            self._n -= 1
+            self._sparse[row] = self._meta[row] = None
+            self._alive[row] = False
+            self._matrix[row] = 0
+            self._free.append(row)
+
+    def _replace(self, feature_id: str, stories, version):
+        self._remove_feature(feature_id)
+        for s in stories or []:
+            if isinstance(s, dict):
+                self._add(feature_id, s)
+        self._versions[feature_id] = version
+
+    def replace_feature(self, feature_id: str, stories, version=None):
+        """Swaps a feature's stories for ``stories`` (as accept does)."""
+        with self._lock:
+            self._replace(feature_id, stories, version)
+            self._maybe_refresh_idf()
+
+    def rebuild(self, features: dict):
+        """Indexes a user-story store's ``features`` mapping from scratch."""
+        with self._lock:
+            self._reset()
+            for fid, block in (features or {}).items():
+                for s in (block or {}).get("stories", []) or []:
+                    if isinstance(s, dict):
+                        self._add(fid, s, dense=False)
+                self._versions[fid] = feature_version(block)
+            self._maybe_refresh_idf()  # first refresh always runs and fills every row
+
+    def sync(self, features: dict) -> int:
+        """Brings the index in line with ``features``, touching only features
+        whose version changed (or that appeared / disappeared). Returns how
+        many features were re-indexed."""
+        features = features or {}
+        with self._lock:
+            stale = [fid for fid, block in features.items() if self._versions.get(fid, ()) != feature_version(block)]
+            gone = [fid for fid in self._versions if fid not in features]
+            for fid in gone:
+                self._remove_feature(fid)
+            for fid in stale:
+                block = features[fid] or {}
+                self._replace(fid, block.get("stories"), feature_version(block))
+            if stale or gone:
+                self._maybe_refresh_idf()
+            return len(stale) + len(gone)
+
+    # ---------- queries ----------
+    def find_duplicates(self, stories, exclude_feature=None, threshold: float = 0.8, top_k: int = 3):
+        """Returns one entry per incoming story with at least one match.
+
+        Stories of ``exclude_feature`` are ignored, so re-accepting a feature
+        never flags its own previous version.
+        """
+        stories = [s for s in stories if isinstance(s, dict)]
+        with self._lock:
+            size = len(self._sparse)
+            if not stories or self._n == 0:
+                return []
+            queries = np.stack([self._dense(*self._sparse_vector(story_text(s))) for s in stories])
+            scores = self._matrix[:size] @ queries.T  # (rows, queries)
+
+            mask = ~self._alive[:size]
+            if exclude_feature is not None:
+                for row in self._rows_by_feature.get(exclude_feature, []):
+                    mask[row] = True
+            scores[mask] = -1.0
+
+            k = min(top_k, size)
+            top = np.argpartition(-scores, k - 1, axis=0)[:k]
+
+            out = []
+            for qi, story in enumerate(stories):
+                rows = sorted(top[:, qi], key=lambda r: -scores[r, qi])
+                matches = [
+                    {**self._meta[r], "score": round(float(scores[r, qi]), 3)}
+                    for r in rows
+                    if scores[r, qi] >= threshold
+                ]
+                if matches:
+                    out.append({
+                        "story_id": str(story.get("story_id") or ""),
+                        "title": str(story.get("title") or ""),
+                        "matches": matches,
+                    })
+            return out
@@ -0,0 +1,179 @@
+"""Feature table storage (Excel) and WSJF computation.
+
+This is the only module that imports pandas; routes import it lazily so
+poker-only traffic never loads pandas / numpy / openpyxl.
+"""
+import os
+import threading
+
+import pandas as pd
+from flask import current_app
+
+import metrics
+from history import get_history
+
+
+# ==================================================
+# SAFe FEATURE GENERATOR (SYSTEM-OWNED)
+# ==================================================
+def generate_safe_features_df():
+    return pd.DataFrame([
+        {
+            "Feature ID": "FTR-PI-001",
+            "Feature Name": "Payments Modernization",
+            "Feature Description": "As a finance stakeholder, I want modern payment processing so that regulatory and customer expectations are met.",
+            "Feature Acceptance Criteria": "• Regulatory compliance met\n• Zero manual reconciliation\n• Peak load validated",
+        },
+        {
+            "Feature ID": "FTR-PI-002",
+            "Feature Name": "Customer Analytics Platform",
+            "Feature Description": "As a business owner, I want unified customer analytics so that decisions are data-driven.",
+            "Feature Acceptance Criteria": "• Single source of truth\n• GDPR compliant\n• Business dashboards available",
+        },
+        {
+            "Feature ID": "FTR-PI-003",
+            "Feature Name": "Legacy System Decommissioning",
+            "Feature Description": "As an IT leader, I want to retire legacy systems so that risk and cost are reduced.",
+            "Feature Acceptance Criteria": "• No active consumers\n• Data archived\n• Support contracts closed",
+        },
+        {
+            "Feature ID": "FTR-PI-004",
+            "Feature Name": "AI Assisted Support",
+            "Feature Description": "As a support manager, I want AI assistance so that resolution time improves.",
+            "Feature Acceptance Criteria": "• Accuracy threshold met\n• Human override enabled\n• Audit logs available",
+        },
+        {
+            "Feature ID": "FTR-PI-005",
+            "Feature Name": "Mobile Experience Revamp",
+            "Feature Description": "As a customer, I want a modern mobile experience so that interactions are intuitive.",
+            "Feature Acceptance Criteria": "• UX council approved\n• Performance benchmarks met\n• Rating improvement tracked",
+        }
+    ])
+
+
+# ==================================================
+# ENSURE EXCEL EXISTS & HAS FEATURES
+# ==================================================
+def ensure_excel_with_features():
+    excel_path = current_app.config["EXCEL_PATH"]
+    changed = False
+    if not os.path.exists(excel_path):
+        df = generate_safe_features_df()
+        changed = True
+    else:
+        with metrics.STORAGE_DURATION.time(op="read_excel"):
+            df = pd.read_excel(excel_path)
+        get_history().observe(df, _file_key(excel_path))
+        if df.empty:
+            df = generate_safe_features_df()
+            changed = True
+
+    required_cols = [
+        "Business Value",
+        "Time Complexity",
+        "OE/RR Value",
+        "Job Size",
+        "Cost of Delay",
+        "WSJF",
+        "Story Points",
+    ]
+    for col in required_cols:
+        if col not in df.columns:
+            df[col] = ""
+            changed = True
+
+    # rewriting an unchanged workbook is the single most expensive step here
+    if changed:
+        write_excel(df, source="init")
+    return df
+
+
+def write_excel(df, source: str = "write"):
+    """Writes the feature table and records any estimation changes in history."""
+    excel_path = current_app.config["EXCEL_PATH"]
+    with metrics.STORAGE_DURATION.time(op="write_excel"):
+        df.to_excel(excel_path, index=False)
+    get_history().record(df, source, file_key=_file_key(excel_path))
+
+
+# ==================================================
+# WSJF COMPUTATION
+# ==================================================
+def compute_wsjf(df):
+    """Fills Cost of Delay / WSJF in place and returns df ranked by WSJF (desc)."""
+    with metrics.WSJF_DURATION.time():
+        for col in ["Business Value", "Time Complexity", "OE/RR Value", "Job Size"]:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+
+        bv = df["Business Value"].fillna(0)
+        tc = df["Time Complexity"].fillna(0)
+        oe = df["OE/RR Value"].fillna(0)
+
+        df["Cost of Delay"] = bv + tc + oe
+
+        df["WSJF"] = df.apply(
+            lambda row: round(row["Cost of Delay"] / row["Job Size"], 2)
+            if pd.notna(row["Job Size"]) and row["Job Size"] > 0
+            else 0,
+            axis=1
+        )
+        return df.sort_values(by="WSJF", ascending=False)
+
+
+
+def get_feature_by_id(feature_id: str):
+    df = ensure_excel_with_features()
+    row = df[df["Feature ID"] == feature_id]
+    if row.empty:
+        return None
+    r = row.iloc[0].to_dict()
+    return {
+        "Feature ID": str(r.get("Feature ID", "")),
+        "Feature Name": str(r.get("Feature Name", "")),
+        "Feature Description": str(r.get("Feature Description", "")),
+        "Feature Acceptance Criteria": str(r.get("Feature Acceptance Criteria", "")),
+    }
+
+
+# ==================================================
+# RANKED TABLE CACHE
+# ==================================================
+_ranked_lock = threading.Lock()
+_ranked_cache = {"key": None, "records": None}
+
+
+def _file_key(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (path, st.st_mtime_ns, st.st_size)
+
+
+def ranked_features(persist: bool = False):
+    """Ranked WSJF records, reused until the Excel file changes on disk.
+
+    With ``persist`` the computed Cost of Delay / WSJF columns are written back
+    on a miss (as the WSJF page always did); the cache is then keyed on the
+    rewritten file so the next request is a hit.
+    """
+    excel_path = current_app.config["EXCEL_PATH"]
+    with _ranked_lock:
+        key = _file_key(excel_path)
+        if key is not None and _ranked_cache["key"] == key:
+            metrics.CACHE_REQUESTS.inc(cache="wsjf_table", result="hit")
+            return _ranked_cache["records"]
+        metrics.CACHE_REQUESTS.inc(cache="wsjf_table", result="miss")
+
+        df = ensure_excel_with_features()
+        ranked = compute_wsjf(df)
+        if persist:
+            try:
+                write_excel(df, source="wsjf")
+            except PermissionError:
+                pass
+
+        records = ranked.to_dict(orient="records")
+        _ranked_cache["key"] = _file_key(excel_path)
+        _ranked_cache["records"] = records
+        return records